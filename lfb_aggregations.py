@@ -0,0 +1,440 @@
+
+import numpy as np
+import pandas as pd
+
+import lfb_timeindex as timeindex
+from lfb_backend import PandasBackend
+
+#######################################################################################
+#######################################################################################
+
+# Dashboard aggregations, expressed once and executed on any query backend
+# from lfb_backend.py. Every function takes the (filtered) incident frame and
+# an optional backend; pandas is the reference when none is given.
+
+INCIDENT_GROUPS = ["False Alarm", "Fire", "Special Service"]
+
+WEEKDAY_ORDER = [
+    "Monday", "Tuesday", "Wednesday",
+    "Thursday", "Friday", "Saturday", "Sunday"
+]
+
+RESPONSE_BANDS = [0, 6, 8, 10, float("inf")]
+RESPONSE_BAND_LABELS = ["≤ 6 min", "6–8 min", "8–10 min", "> 10 min"]
+
+DECOMPOSITION_ORDER = ["Fire", "Special Service", "False Alarm"]
+
+DECOMPOSITION_COMPONENTS = {
+    "Turnout": "TurnoutTimeSeconds",
+    "Travel": "TravelTimeSeconds",
+}
+
+DECOMPOSITION_PERCENTILES = [0.5, 0.9, 0.95]
+
+#######################################################################################
+#######################################################################################
+
+
+def _backend(backend):
+    return backend if backend is not None else PandasBackend()
+
+
+def compute_kpis(df, backend=None):
+    backend = _backend(backend)
+
+    attendance = "FirstPumpArriving_AttendanceTime"
+
+    summary = backend.aggregate(df, [], {
+        "total_incidents": (None, "size"),
+        "median_response": (attendance, "median"),
+        "response_within_6min": ("FirstPump_Within_6min", "mean"),
+        "p90_response": (attendance, ("quantile", 0.90)),
+        "avg_response": (attendance, "mean"),
+        "second_pump_rate": ("SecondPumpArriving_AttendanceTime", "notna"),
+        "avg_pumps": ("NumPumpsAttending", "mean"),
+    }).iloc[0]
+
+    group_counts = (
+        backend.aggregate(df, ["IncidentGroup"], {"Count": (None, "size")})
+        .set_index("IncidentGroup")["Count"]
+    )
+
+    total = int(summary["total_incidents"])
+
+    def group_rate(group):
+        if total == 0:
+            return float("nan")
+        return group_counts.get(group, 0) / total * 100
+
+    return {
+        "total_incidents": total,
+        "median_response": summary["median_response"] / 60,
+        "response_within_6min": summary["response_within_6min"] * 100,
+        "false_alarm_rate": group_rate("False Alarm"),
+        "fire_rate": group_rate("Fire"),
+        "special_service_rate": group_rate("Special Service"),
+        "p90_response": summary["p90_response"] / 60,
+        "avg_response": summary["avg_response"] / 60,
+        "second_pump_rate": summary["second_pump_rate"] * 100,
+        "avg_pumps": summary["avg_pumps"],
+    }
+
+#######################################################################################
+#######################################################################################
+
+
+def monthly_incidents_by_type(df, backend=None):
+    # Monthly unique incident counts by incident type
+    return _backend(backend).aggregate(
+        df, ["CallMonth", "IncidentGroup"], {"IncidentCount": ("IncidentNumber", "nunique")}
+    )
+
+
+def monthly_incidents_total(df, backend=None):
+    # Monthly unique incident counts across all incident types
+    return _backend(backend).aggregate(
+        df, ["CallMonth"], {"IncidentCount": ("IncidentNumber", "nunique")}
+    )
+
+
+def daily_hourly_incidents(df, backend=None):
+    # Weekday x hour unique incident counts, hours 0–23 by Monday → Sunday
+    counts = _backend(backend).aggregate(
+        df, ["HourOfCall", "CallWeekday"], {"IncidentCount": ("IncidentNumber", "nunique")}
+    )
+
+    return (
+        counts
+        .pivot(index="HourOfCall", columns="CallWeekday", values="IncidentCount")
+        .reindex(index=range(24))
+        .reindex(columns=WEEKDAY_ORDER)
+    )
+
+
+def avg_firstpump_attendance_by_type(df, backend=None):
+    result = _backend(backend).aggregate(
+        df, ["CallMonth", "IncidentGroup"],
+        {"AvgFirstPumpMinutes": ("FirstPumpArriving_AttendanceTime", "mean")}
+    )
+    result["AvgFirstPumpMinutes"] = result["AvgFirstPumpMinutes"] / 60
+    return result
+
+
+def avg_firstpump_attendance_total(df, backend=None):
+    result = _backend(backend).aggregate(
+        df, ["CallMonth"],
+        {"AvgFirstPumpMinutes": ("FirstPumpArriving_AttendanceTime", "mean")}
+    )
+    result["AvgFirstPumpMinutes"] = result["AvgFirstPumpMinutes"] / 60
+    return result
+
+#######################################################################################
+#######################################################################################
+
+
+def median_response_by_borough(df, backend=None):
+    result = _backend(backend).aggregate(
+        df, ["IncGeo_BoroughName"],
+        {"MedianResponseMinutes": ("FirstPumpArriving_AttendanceTime", "median")}
+    )
+    result["MedianResponseMinutes"] = result["MedianResponseMinutes"] / 60
+    return result.sort_values("MedianResponseMinutes")
+
+
+def compliance_by_borough(df, backend=None):
+    result = _backend(backend).aggregate(
+        df, ["IncGeo_BoroughName"],
+        {"CompliancePercent": ("FirstPump_Within_6min", "mean")}
+    )
+    result["CompliancePercent"] = result["CompliancePercent"] * 100
+    return result.sort_values("CompliancePercent")
+
+#######################################################################################
+#######################################################################################
+
+
+def response_bands(response_minutes):
+    return pd.cut(
+        response_minutes,
+        bins=RESPONSE_BANDS,
+        labels=RESPONSE_BAND_LABELS,
+        right=True
+    )
+
+
+def band_pivot(df, backend=None):
+    # Narrow frame: only the columns the band counts need
+    bands = pd.DataFrame({
+        "IncidentGroup": df["IncidentGroup"],
+        "ResponseBand": response_bands(df["FirstPumpArriving_AttendanceTime"] / 60),
+    })
+
+    # Count incidents per band & type
+    band_counts = _backend(backend).aggregate(
+        bands, ["IncidentGroup", "ResponseBand"], {"Count": (None, "size")}
+    )
+
+    # Calculate percentage within each IncidentGroup
+    band_counts["Percent"] = (
+        band_counts.groupby("IncidentGroup")["Count"]
+        .transform(lambda x: 100 * x / x.sum())
+    )
+
+    pivot = band_counts.pivot(
+        index="IncidentGroup",
+        columns="ResponseBand",
+        values="Percent"
+    ).reindex(columns=RESPONSE_BAND_LABELS).fillna(0)
+
+    pivot.columns = pd.CategoricalIndex(
+        pivot.columns, categories=RESPONSE_BAND_LABELS, ordered=True, name="ResponseBand"
+    )
+    return pivot
+
+
+def decomposition(df, backend=None):
+    # Average turnout & travel per incident type, in minutes
+    result = _backend(backend).aggregate(df, ["IncidentGroup"], {
+        "TurnoutTimeSeconds": ("TurnoutTimeSeconds", "mean"),
+        "TravelTimeSeconds": ("TravelTimeSeconds", "mean"),
+    })
+    result[["TurnoutTimeSeconds", "TravelTimeSeconds"]] = (
+        result[["TurnoutTimeSeconds", "TravelTimeSeconds"]] / 60
+    )
+
+    result["TotalMinutes"] = (
+        result["TurnoutTimeSeconds"] +
+        result["TravelTimeSeconds"]
+    )
+
+    # Percentage contribution
+    result["TurnoutPercent"] = (
+        result["TurnoutTimeSeconds"] /
+        result["TotalMinutes"] * 100
+    )
+
+    result["TravelPercent"] = (
+        result["TravelTimeSeconds"] /
+        result["TotalMinutes"] * 100
+    )
+
+    order = [group for group in DECOMPOSITION_ORDER if group in set(result["IncidentGroup"])]
+    return result.set_index("IncidentGroup").loc[order].reset_index()
+
+
+def segment_quantiles(codes, values, n_segments, qs):
+    # Quantiles of values per segment (codes 0..n_segments-1, -1 = no segment)
+    # from one sort: ordered by (segment, value), every segment is a contiguous
+    # run and each quantile is two gathers into it. Linear interpolation as in
+    # pandas; NaN values are ignored, empty segments give NaN.
+    keep = (codes >= 0) & ~np.isnan(values)
+    codes, values = codes[keep], values[keep]
+
+    # Value sort, then a stable sort by segment (a radix sort on small ints)
+    order = np.argsort(values)
+    segment_dtype = np.int16 if n_segments <= np.iinfo(np.int16).max else np.int64
+    ordered = values[order[np.argsort(codes[order].astype(segment_dtype), kind="stable")]]
+    counts = np.bincount(codes, minlength=n_segments)
+    starts = np.cumsum(counts) - counts
+
+    result = np.full((n_segments, len(qs)), np.nan)
+    present = counts > 0
+
+    for j, q in enumerate(qs):
+        position = (counts[present] - 1) * q
+        below = np.floor(position).astype(np.int64)
+        above = np.ceil(position).astype(np.int64)
+
+        lower = ordered[starts[present] + below]
+        upper = ordered[starts[present] + above]
+        result[present, j] = lower + (upper - lower) * (position - below)
+
+    return result
+
+
+def percentile_decomposition(df, by, qs=DECOMPOSITION_PERCENTILES, order=None):
+    # Turnout and travel percentiles per group, in minutes: one row per
+    # (group, component). Both components are stacked into one array so all
+    # groups and percentiles come out of a single sort.
+    codes, groups = pd.factorize(df[by], sort=True)
+    components = list(DECOMPOSITION_COMPONENTS)
+    n_groups = len(groups)
+
+    quantiles = segment_quantiles(
+        np.concatenate([np.where(codes >= 0, codes + i * n_groups, -1) for i in range(len(components))]),
+        np.concatenate([df[column].to_numpy(dtype=float) for column in DECOMPOSITION_COMPONENTS.values()]),
+        n_groups * len(components),
+        qs
+    ).reshape(len(components), n_groups, len(qs))
+
+    # Groups in the given order (sorted otherwise), skipping groups without data
+    positions = np.arange(n_groups) if order is None else groups.get_indexer(order)
+    positions = positions[positions >= 0]
+    positions = positions[~np.isnan(quantiles[:, positions]).all(axis=(0, 2))]
+
+    result = pd.DataFrame(
+        quantiles[:, positions].transpose(1, 0, 2).reshape(-1, len(qs)) / 60,
+        columns=[f"P{round(q * 100)}" for q in qs]
+    )
+    result.insert(0, "Component", np.tile(components, len(positions)))
+    result.insert(0, by, np.repeat(np.asarray(groups[positions], dtype=object), len(components)))
+
+    return result
+
+
+def _cell_medians(cells, seconds, n_cells, weights=None):
+    # Median first pump attendance (seconds) per cell from 1-second histograms
+    # (see lfb_timeindex.py); weights counts repeated values
+    n_bins = timeindex.HIST_MAX_SECONDS + 1
+    bins = np.clip(np.floor(seconds), 0, timeindex.HIST_MAX_SECONDS).astype(np.int64)
+    histogram = np.bincount(cells * n_bins + bins, weights=weights, minlength=n_cells * n_bins)
+    histogram = histogram.reshape(n_cells, n_bins)
+    medians = timeindex.histogram_quantiles(histogram, 0.5)
+
+    # Medians at or beyond the histogram cap: exact, from the values of those cells
+    capped = np.isnan(medians) & (histogram.sum(axis=1) > 0)
+    if capped.any():
+        rows = capped[cells]
+        repeats = 1 if weights is None else weights[rows]
+        exact = (
+            pd.Series(np.repeat(seconds[rows], repeats))
+            .groupby(np.repeat(cells[rows], repeats))
+            .median()
+        )
+        medians[exact.index.to_numpy()] = exact.to_numpy()
+
+    return medians
+
+
+def _volume_frame(boroughs, groups, volume, medians):
+    result = pd.DataFrame({
+        "IncGeo_BoroughName": np.repeat(np.asarray(boroughs, dtype=object), len(groups)),
+        "IncidentGroup": np.tile(np.asarray(groups, dtype=object), len(boroughs)),
+        "Incidents": volume.astype(np.int64),
+        "MedianResponse": medians / 60,
+    })
+
+    return result[result["Incidents"] > 0].reset_index(drop=True)
+
+
+def borough_group_volume(df):
+    # Distinct incidents and median first pump attendance (minutes) per
+    # (borough, incident group), from counts and per-cell attendance
+    # histograms built with bincount instead of a grouped aggregation
+    borough_codes, boroughs = pd.factorize(df["IncGeo_BoroughName"], sort=True)
+    group_codes, groups = pd.factorize(df["IncidentGroup"], sort=True)
+    incident_codes, incidents = pd.factorize(df["IncidentNumber"])
+
+    n_cells = len(boroughs) * len(groups)
+    cells = borough_codes.astype(np.int64) * len(groups) + group_codes
+    in_cell = (borough_codes >= 0) & (group_codes >= 0)
+
+    # Distinct incidents: unique (cell, incident) pairs (hash-based) per cell
+    counted = in_cell & (incident_codes >= 0)
+    pairs = pd.unique(cells[counted] * max(len(incidents), 1) + incident_codes[counted])
+    volume = np.bincount(pairs // max(len(incidents), 1), minlength=n_cells)
+
+    attendance = df["FirstPumpArriving_AttendanceTime"].to_numpy(dtype=float)
+    timed = in_cell & ~np.isnan(attendance)
+    medians = _cell_medians(cells[timed], attendance[timed], n_cells)
+
+    return _volume_frame(boroughs, groups, volume, medians)
+
+
+def build_borough_group_daily(df):
+    # Load-time pre-aggregates of borough_group_volume per call date, so a
+    # date window without dimension filters is served without touching the
+    # incident rows. df must be sorted by CallDate (see sort_by_call_date).
+    days, day_index = np.unique(df["CallDate"].dt.normalize().to_numpy(), return_inverse=True)
+    borough_codes, boroughs = pd.factorize(df["IncGeo_BoroughName"], sort=True)
+    group_codes, groups = pd.factorize(df["IncidentGroup"], sort=True)
+    incident_codes, incidents = pd.factorize(df["IncidentNumber"])
+
+    n_cells = len(boroughs) * len(groups)
+    n_incidents = max(len(incidents), 1)
+    day_cells = day_index.astype(np.int64) * n_cells + borough_codes * len(groups) + group_codes
+    in_cell = (borough_codes >= 0) & (group_codes >= 0)
+
+    # Distinct (day, cell, incident) triples, sorted by day
+    counted = in_cell & (incident_codes >= 0)
+    triples = np.unique(day_cells[counted] * n_incidents + incident_codes[counted])
+    triple_day_cells = triples // n_incidents
+
+    # (cell, incident) pairs seen on more than one day: a window counts them
+    # once per day, so their extra days are subtracted
+    _, pair_index, pair_days = np.unique(
+        triple_day_cells % n_cells * n_incidents + triples % n_incidents,
+        return_inverse=True, return_counts=True
+    )
+    repeated = pair_days[pair_index] > 1
+
+    # Attendance values with their counts per (day, cell), sorted by day
+    attendance = df["FirstPumpArriving_AttendanceTime"].to_numpy(dtype=float)
+    timed = in_cell & ~np.isnan(attendance)
+    values, value_codes = np.unique(attendance[timed], return_inverse=True)
+    n_values = max(len(values), 1)
+    entries, counts = np.unique(day_cells[timed] * n_values + value_codes, return_counts=True)
+
+    return {
+        "days": pd.DatetimeIndex(days),
+        "boroughs": np.asarray(boroughs, dtype=object),
+        "groups": np.asarray(groups, dtype=object),
+        "incidents": np.bincount(triple_day_cells, minlength=len(days) * n_cells).reshape(len(days), n_cells),
+        "repeated_day": (triple_day_cells[repeated] // n_cells).astype(np.int32),
+        "repeated_cell": (triple_day_cells[repeated] % n_cells).astype(np.int32),
+        "repeated_pair": pair_index[repeated].astype(np.int64),
+        "attendance_day": (entries // n_values // n_cells).astype(np.int32),
+        "attendance_cell": (entries // n_values % n_cells).astype(np.int64),
+        "attendance_seconds": values[entries % n_values] if len(values) else np.array([]),
+        "attendance_count": counts.astype(np.int64),
+    }
+
+
+def borough_group_volume_range(daily, start, end):
+    # borough_group_volume of the call dates start..end (both inclusive),
+    # from build_borough_group_daily
+    lo = daily["days"].searchsorted(pd.Timestamp(start), side="left")
+    hi = daily["days"].searchsorted(pd.Timestamp(end), side="right")
+    n_cells = len(daily["boroughs"]) * len(daily["groups"])
+
+    volume = daily["incidents"][lo:hi].sum(axis=0)
+
+    first, last = np.searchsorted(daily["repeated_day"], [lo, hi])
+    if last > first:
+        pairs, positions, days_seen = np.unique(
+            daily["repeated_pair"][first:last], return_index=True, return_counts=True
+        )
+        cells = daily["repeated_cell"][first:last][positions]
+        volume = volume - np.bincount(cells, weights=days_seen - 1, minlength=n_cells).astype(np.int64)
+
+    first, last = np.searchsorted(daily["attendance_day"], [lo, hi])
+    medians = _cell_medians(
+        daily["attendance_cell"][first:last],
+        daily["attendance_seconds"][first:last],
+        n_cells,
+        weights=daily["attendance_count"][first:last],
+    )
+
+    return _volume_frame(daily["boroughs"], daily["groups"], volume, medians)
+
+
+def delay_counts_extreme(df, backend=None):
+    # Delay codes behind incidents exceeding 10 minutes, largest first
+    extreme_df = df.loc[
+        df["FirstPumpArriving_AttendanceTime"] / 60 > 10,
+        ["DelayCode_Description"]
+    ]
+
+    counts = _backend(backend).aggregate(
+        extreme_df, ["DelayCode_Description"], {"IncidentCount": (None, "size")}
+    )
+    counts = counts.sort_values(
+        ["IncidentCount", "DelayCode_Description"], ascending=[False, True]
+    ).reset_index(drop=True)
+
+    total_extreme = counts["IncidentCount"].sum()
+
+    counts["Percent"] = counts["IncidentCount"] / total_extreme * 100
+    counts["CumulativePercent"] = counts["Percent"].cumsum()
+
+    return counts
@@ -0,0 +1,245 @@
+
+import warnings
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+import lfb_timeindex as timeindex
+from lfb_aggregations import segment_quantiles
+
+#######################################################################################
+#######################################################################################
+
+# Daily anomaly detection on response performance.
+#
+# For every call date and area (London as a whole plus each borough) two daily
+# series are kept: the median first pump attendance time and the share of
+# extreme delays (> 10 minutes). The London series come from the per-day
+# pre-aggregates (lfb_timeindex.py); the borough series from one segment
+# quantile pass over the day's rows.
+#
+# Each day is scored against a robust baseline of the trailing BASELINE_DAYS
+# calendar days (current day excluded): z = (value - median) / (1.4826 * MAD),
+# computed for all areas at once over sliding windows. Days with |z| at or
+# above THRESHOLD are flagged.
+#
+# A rate over few incidents moves in steps of 100 / n percentage points, far
+# beyond the day-to-day MAD of a borough. Rate metrics are therefore scored on
+# the arcsine square root scale, where a binomial proportion of n incidents
+# has standard deviation 1 / (2 * sqrt(n)) whatever the rate. That binomial
+# spread of the day's own count floors the MAD: a small area-day must differ
+# from its baseline by several whole incidents to be flagged.
+#
+# The state is built incrementally: update_anomalies() rebuilds only the days
+# it is given and rescores only the days whose trailing window contains one
+# of them. A first build is an update of an empty state.
+
+LONDON = "All London"
+
+BASELINE_DAYS = 28
+MIN_BASELINE_DAYS = 14
+
+THRESHOLD = 3.5
+
+# min_incidents: area-days with fewer attended incidents are too noisy to score
+# mad_floor: MAD = 0 would flag any change, so the spread is floored (minutes)
+# binomial: rate in percent of the day's incidents, scored against the
+#     binomial spread of its count instead of a fixed floor
+METRICS = {
+    "median_response": {
+        "label": "Median attendance (min)", "min_incidents": 5, "mad_floor": 0.1, "binomial": False,
+    },
+    "extreme_delay_rate": {
+        "label": "Extreme delays (%)", "min_incidents": 20, "mad_floor": 0.0, "binomial": True,
+    },
+}
+
+#######################################################################################
+#######################################################################################
+
+
+def daily_series(df):
+    # Per-day series of every area for the call dates in df, one wide frame
+    # (call dates x areas) per metric plus the attended incident counts.
+    # df must hold complete days, sorted by CallDate.
+    daily = timeindex.build_daily_aggregates(df)
+    table = daily["table"]
+    days = table.index
+
+    def rate(part, whole):
+        return np.divide(part * 100.0, whole, out=np.full(len(whole), np.nan), where=whole > 0)
+
+    london_counts = table["AttendanceCount"].to_numpy(dtype=float)
+
+    london = {
+        "incidents": london_counts,
+        "median_response": timeindex.histogram_quantiles(daily["histogram"], 0.5) / 60,
+        "extreme_delay_rate": rate(table["ExtremeDelays"].to_numpy(dtype=float), london_counts),
+    }
+
+    # Boroughs: one cell per (day, borough), all medians from a single sort
+    area_codes, areas = pd.factorize(df["IncGeo_BoroughName"], sort=True)
+    day_codes = days.get_indexer(df["CallDate"].dt.normalize())
+    attendance = df["FirstPumpArriving_AttendanceTime"].to_numpy(dtype=float)
+
+    n_cells = len(days) * len(areas)
+    cells = np.where(area_codes >= 0, day_codes * len(areas) + area_codes, -1)
+    attended = (cells >= 0) & ~np.isnan(attendance)
+
+    counts = np.bincount(cells[attended], minlength=n_cells).astype(float)
+    extreme = np.bincount(
+        cells[attended],
+        weights=attendance[attended] > timeindex.EXTREME_DELAY_SECONDS,
+        minlength=n_cells
+    )
+
+    boroughs = {
+        "incidents": counts,
+        "median_response": segment_quantiles(cells, attendance, n_cells, [0.5])[:, 0] / 60,
+        "extreme_delay_rate": rate(extreme, counts),
+    }
+
+    columns = pd.Index([LONDON] + list(areas), name="Area")
+
+    return {
+        name: pd.DataFrame(
+            np.column_stack([london[name], boroughs[name].reshape(len(days), len(areas))]),
+            index=days,
+            columns=columns,
+        )
+        for name in london
+    }
+
+
+def robust_scores(values, incidents, settings, start=0, stop=None):
+    # Baseline (trailing median) and robust z-scores of rows [start:stop],
+    # both shaped like values[start:stop]. Rows are consecutive calendar days;
+    # settings is the metric's METRICS entry.
+    stop = len(values) if stop is None else stop
+    values = values.where(incidents >= settings["min_incidents"])
+    context = max(start - BASELINE_DAYS, 0)
+    x = values.to_numpy(dtype=float)[context:stop]
+
+    if settings["binomial"]:
+        x = np.arcsin(np.sqrt(x / 100))
+
+    # windows[i] holds the BASELINE_DAYS rows before row i
+    padded = np.vstack([np.full((BASELINE_DAYS, x.shape[1]), np.nan), x])
+    windows = sliding_window_view(padded[:-1], BASELINE_DAYS, axis=0)
+
+    with warnings.catch_warnings():
+        # All-NaN windows (no scorable days yet) give NaN, which is intended
+        warnings.simplefilter("ignore", RuntimeWarning)
+        baseline = np.nanmedian(windows, axis=2)
+        mad = np.nanmedian(np.abs(windows - baseline[..., None]), axis=2)
+
+    spread = 1.4826 * np.maximum(mad, settings["mad_floor"])
+
+    if settings["binomial"]:
+        counts = incidents.to_numpy(dtype=float)[context:stop]
+        with np.errstate(divide="ignore"):
+            spread = np.maximum(spread, 0.5 / np.sqrt(counts))
+
+    scores = (x - baseline) / spread
+
+    if settings["binomial"]:
+        # Medians commute with the monotone transform: back to percent
+        baseline = 100 * np.sin(baseline) ** 2
+    scores[(~np.isnan(windows)).sum(axis=2) < MIN_BASELINE_DAYS] = np.nan
+
+    offset = start - context
+
+    def frame(array):
+        return pd.DataFrame(array[offset:], index=values.index[start:stop], columns=values.columns)
+
+    return frame(baseline), frame(scores)
+
+
+def update_anomalies(state, df):
+    # df holds every row of the days to add or replace (sorted by CallDate);
+    # state is the result of a previous update, or None for a first build
+    new = daily_series(df)
+
+    if state is None:
+        series = new
+    else:
+        series = {
+            name: pd.concat([old.drop(new[name].index, errors="ignore"), new[name]]).sort_index()
+            for name, old in state["series"].items()
+        }
+
+    # Consecutive calendar days, so every window spans BASELINE_DAYS days
+    days = series["incidents"].index
+    calendar = pd.date_range(days.min(), days.max(), freq="D", name="CallDate")
+    series = {name: frame.reindex(calendar) for name, frame in series.items()}
+
+    # Only days from the first new day until BASELINE_DAYS after the last one
+    # see a changed value or window; the others keep their scores
+    if state is None:
+        start, stop = 0, len(calendar)
+    else:
+        new_days = new["incidents"].index
+        # Empty days between the previous last day and the new rows are
+        # new to the calendar as well
+        start = min(
+            int(calendar.searchsorted(new_days.min())),
+            int(calendar.searchsorted(state["series"]["incidents"].index.max())) + 1
+        )
+        stop = min(int(calendar.searchsorted(new_days.max())) + BASELINE_DAYS + 1, len(calendar))
+
+    baselines, scores = {}, {}
+
+    for metric, settings in METRICS.items():
+        baseline, score = robust_scores(
+            series[metric], series["incidents"], settings, start, stop
+        )
+
+        if state is not None:
+            # Days outside [start, stop) keep their previous baseline and score
+            before, after = calendar[:start], calendar[stop:]
+            baseline = pd.concat([
+                state["baselines"][metric].reindex(before), baseline,
+                state["baselines"][metric].reindex(after)
+            ])
+            score = pd.concat([
+                state["scores"][metric].reindex(before), score,
+                state["scores"][metric].reindex(after)
+            ])
+
+        baselines[metric] = baseline.reindex(columns=series[metric].columns)
+        scores[metric] = score.reindex(columns=series[metric].columns)
+
+    return {"series": series, "baselines": baselines, "scores": scores}
+
+
+def anomalies(state, start=None, end=None, areas=None, days=None):
+    # Flagged (day, area, metric) cells between start and end, strongest
+    # first; days optionally restricts them to the selected call dates
+    results = []
+
+    for metric, settings in METRICS.items():
+        scores = state["scores"][metric].loc[start:end]
+        if days is not None:
+            scores = scores[scores.index.isin(days)]
+        if areas:
+            scores = scores[[area for area in areas if area in scores.columns]]
+
+        stacked = scores.stack()
+        flagged = stacked[stacked.abs() >= THRESHOLD]
+
+        def lookup(frame):
+            return frame.stack().reindex(flagged.index).to_numpy()
+
+        results.append(pd.DataFrame({
+            "Date": flagged.index.get_level_values("CallDate").date,
+            "Area": flagged.index.get_level_values("Area"),
+            "Metric": settings["label"],
+            "Value": lookup(state["series"][metric]),
+            "Baseline": lookup(state["baselines"][metric]),
+            "Score": flagged.to_numpy(),
+            "Incidents": lookup(state["series"]["incidents"]).astype(int),
+        }))
+
+    result = pd.concat(results, ignore_index=True)
+    return result.sort_values("Score", key=np.abs, ascending=False, ignore_index=True)
@@ -0,0 +1,239 @@
+
+import importlib.util
+import threading
+import weakref
+
+import pandas as pd
+
+# DuckDB is optional (pandas stays the reference engine) and only imported
+# when a DuckDB query actually runs
+HAS_DUCKDB = importlib.util.find_spec("duckdb") is not None
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+#######################################################################################
+#######################################################################################
+
+# Query backends for the aggregation layer.
+#
+# Every dashboard aggregation is expressed once (see lfb_aggregations.py) as
+# a grouped aggregation: group keys plus a mapping of
+#
+#     output name -> (column, how)
+#
+# where `how` is one of "size", "count", "nunique", "sum", "mean", "median",
+# "notna" (share of non-null values) or ("quantile", q).
+#
+# Each backend executes that specification and returns a flat DataFrame with
+# the key columns first, sorted by the keys, and rows with a missing key
+# dropped (the pandas groupby default).
+
+#######################################################################################
+#######################################################################################
+
+
+def _describe(how):
+    if isinstance(how, tuple):
+        return how[0]
+    return how
+
+
+class PandasBackend:
+    """Reference implementation on single-threaded pandas groupbys."""
+
+    name = "pandas"
+
+    def aggregate(self, df, keys, aggs):
+        keys = list(keys)
+
+        if not keys:
+            row = {name: self._scalar(df, column, how) for name, (column, how) in aggs.items()}
+            return pd.DataFrame([row])
+
+        grouped = df.groupby(keys, observed=True)
+
+        results = []
+        for name, (column, how) in aggs.items():
+            results.append(self._grouped(grouped, column, how).rename(name))
+
+        return pd.concat(results, axis=1).reset_index()
+
+    def _scalar(self, df, column, how):
+        kind = _describe(how)
+
+        if kind == "size":
+            return len(df)
+        if kind == "count":
+            return df[column].count()
+        if kind == "nunique":
+            return df[column].nunique()
+        if kind == "sum":
+            return df[column].sum()
+        if kind == "mean":
+            return df[column].mean()
+        if kind == "median":
+            return df[column].median()
+        if kind == "notna":
+            return df[column].notna().mean()
+        if kind == "quantile":
+            return df[column].quantile(how[1])
+
+        raise ValueError(f"Unsupported aggregation: {how!r}")
+
+    def _grouped(self, grouped, column, how):
+        kind = _describe(how)
+
+        if kind == "size":
+            return grouped.size()
+        if kind == "notna":
+            return grouped[column].agg(lambda x: x.notna().mean())
+        if kind == "quantile":
+            return grouped[column].quantile(how[1])
+        if kind in ("count", "nunique", "sum", "mean", "median"):
+            return getattr(grouped[column], kind)()
+
+        raise ValueError(f"Unsupported aggregation: {how!r}")
+
+
+# DuckDB connections are not shared safely between the threads Streamlit runs
+# sessions (and the section pool) on, so each thread keeps its own. Frames are
+# registered for one query only: a connection never keeps a frame alive.
+_duckdb_local = threading.local()
+
+# Arrow copy of each frame queried, shared by all threads: id(frame) -> table.
+# An entry lives exactly as long as its frame (dropped by a finalizer).
+_arrow_tables = {}
+_arrow_lock = threading.Lock()
+
+
+def _arrow_table(df):
+    # DuckDB scans pandas string columns row by row on every query; one
+    # conversion to Arrow per frame makes every later scan columnar
+    key = id(df)
+    with _arrow_lock:
+        table = _arrow_tables.get(key)
+    if table is not None:
+        return table
+
+    import pyarrow as pa
+    table = pa.Table.from_pandas(df, preserve_index=False)
+
+    with _arrow_lock:
+        if key not in _arrow_tables:
+            _arrow_tables[key] = table
+            weakref.finalize(df, _forget_arrow_table, key)
+        return _arrow_tables[key]
+
+
+def _forget_arrow_table(key):
+    with _arrow_lock:
+        _arrow_tables.pop(key, None)
+
+
+class DuckDBBackend:
+    """Multi-threaded in-process columnar engine, queried over the pandas frame."""
+
+    name = "duckdb"
+
+    def __init__(self, threads=None):
+        self.threads = threads
+
+    def _connection(self):
+        # This thread's connection, reused by every query of the thread
+        state = _duckdb_local.__dict__
+
+        if state.get("threads", object()) != self.threads:
+            import duckdb
+
+            if "con" in state:
+                state["con"].close()
+            state["con"] = duckdb.connect()
+            state["threads"] = self.threads
+            if self.threads:
+                state["con"].execute(f"SET threads TO {int(self.threads)}")
+
+        return state["con"]
+
+    def _query(self, df, query):
+        # query over df registered as "frame", unregistered again afterwards
+        con = self._connection()
+        con.register("frame", _arrow_table(df) if HAS_PYARROW else df)
+        try:
+            return con.execute(query).df()
+        finally:
+            con.unregister("frame")
+
+    def aggregate(self, df, keys, aggs):
+        keys = list(keys)
+
+        select = [self._quote(key) for key in keys]
+        select += [
+            f"{self._expression(column, how)} AS {self._quote(name)}"
+            for name, (column, how) in aggs.items()
+        ]
+
+        query = f"SELECT {', '.join(select)} FROM frame"
+
+        if keys:
+            quoted = ", ".join(self._quote(key) for key in keys)
+            not_null = " AND ".join(f"{self._quote(key)} IS NOT NULL" for key in keys)
+            query += f" WHERE {not_null} GROUP BY {quoted} ORDER BY {quoted}"
+
+        result = self._query(df, query)
+
+        # Keep categorical keys (e.g. response bands) in their original categories
+        for key in keys:
+            if isinstance(df[key].dtype, pd.CategoricalDtype):
+                result[key] = result[key].astype(df[key].dtype)
+
+        return result
+
+    @staticmethod
+    def _quote(name):
+        return '"' + name.replace('"', '""') + '"'
+
+    def _expression(self, column, how):
+        kind = _describe(how)
+        col = self._quote(column) if column is not None else None
+
+        if kind == "size":
+            return "COUNT(*)"
+        if kind == "count":
+            return f"COUNT({col})"
+        if kind == "nunique":
+            return f"COUNT(DISTINCT {col})"
+        if kind == "sum":
+            return f"SUM({col})"
+        if kind == "mean":
+            return f"AVG(CAST({col} AS DOUBLE))"
+        if kind == "median":
+            return f"quantile_cont(CAST({col} AS DOUBLE), 0.5)"
+        if kind == "notna":
+            return f"AVG(CASE WHEN {col} IS NULL THEN 0.0 ELSE 1.0 END)"
+        if kind == "quantile":
+            return f"quantile_cont(CAST({col} AS DOUBLE), {float(how[1])})"
+
+        raise ValueError(f"Unsupported aggregation: {how!r}")
+
+#######################################################################################
+#######################################################################################
+
+BACKENDS = {
+    "pandas": PandasBackend,
+    "duckdb": DuckDBBackend,
+}
+
+
+def available_backends():
+    names = ["pandas"]
+    if HAS_DUCKDB:
+        names.append("duckdb")
+    return names
+
+
+def get_backend(name="pandas"):
+    if name not in available_backends():
+        raise ValueError(
+            f"Unknown or unavailable query backend: {name!r} "
+            f"(available: {', '.join(available_backends())})"
+        )
+    return BACKENDS[name]()
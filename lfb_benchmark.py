@@ -0,0 +1,72 @@
+
+"""Load-time benchmark of the prepared-dataset pipeline.
+
+Times reading the parquet file, the data-quality validation stage and the
+feature engineering, and fails (exit status 1) when validation takes more
+than the allowed share of the total load time:
+
+    python lfb_benchmark.py --repeat 5 --max-validation-share 0.10
+"""
+
+import argparse
+import sys
+import time
+
+import lfb_data as data
+import lfb_quality as quality
+
+#######################################################################################
+#######################################################################################
+
+
+def time_load(path):
+    # One load, split into its stages (seconds)
+    started = time.perf_counter()
+    df = data.load_data(path)
+    read = time.perf_counter()
+
+    df, report = quality.validate(df)
+    validated = time.perf_counter()
+
+    data.add_features(df)
+    prepared = time.perf_counter()
+
+    return {
+        "read": read - started,
+        "validate": validated - read,
+        "prepare": prepared - validated,
+        "rows": report["summary"]["rows"],
+        "quarantined": report["summary"]["quarantined_rows"],
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default=data.DATA_PATH, help="incident parquet file")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--max-validation-share", type=float, default=0.10,
+                        help="allowed share of the total load time spent validating")
+    args = parser.parse_args(argv)
+
+    runs = [time_load(args.data) for _ in range(args.repeat)]
+
+    # Best of the repeats: the least disturbed measurement of each stage
+    best = {stage: min(run[stage] for run in runs) for stage in ["read", "validate", "prepare"]}
+    total = sum(best.values())
+    share = best["validate"] / total
+
+    print(f"{runs[0]['rows']:,} rows ({runs[0]['quarantined']:,} quarantined), best of {args.repeat}:")
+    for stage, seconds in best.items():
+        print(f"  {stage:<9}{seconds * 1000:9.1f} ms  {seconds / total:6.1%}")
+    print(f"  {'total':<9}{total * 1000:9.1f} ms")
+
+    if share > args.max_validation_share:
+        print(f"FAIL: validation takes {share:.1%} of load time (limit {args.max_validation_share:.0%})")
+        return 1
+
+    print(f"OK: validation takes {share:.1%} of load time (limit {args.max_validation_share:.0%})")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
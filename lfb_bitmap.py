@@ -0,0 +1,82 @@
+
+import numpy as np
+import pandas as pd
+
+#######################################################################################
+#######################################################################################
+
+# Bitmap indexes over the prepared incident frame.
+#
+# For each indexed column, every distinct value maps to a packed bitmap
+# (np.packbits, one bit per row). Built once at load time, multi-filter
+# selections then resolve by bitwise OR within a column and bitwise AND
+# across columns, touching n_rows / 8 bytes per bitmap instead of scanning
+# the frame once per boolean mask.
+
+#######################################################################################
+#######################################################################################
+
+
+def build_bitmap_index(df, columns):
+    n_rows = len(df)
+    index = {"n_rows": n_rows, "columns": {}}
+
+    for column in columns:
+        codes, uniques = pd.factorize(df[column], sort=True)
+
+        # Group row positions by value code in one stable sort
+        order = np.argsort(codes, kind="stable")
+        counts = np.bincount(codes[codes >= 0], minlength=len(uniques))
+        offset = np.count_nonzero(codes < 0)  # missing values sort first
+
+        bitmaps = {}
+        for value, count in zip(uniques, counts):
+            rows = order[offset:offset + count]
+            offset += count
+
+            bits = np.zeros(n_rows, dtype=bool)
+            bits[rows] = True
+            bitmaps[value] = np.packbits(bits)
+
+        index["columns"][column] = bitmaps
+
+    return index
+
+
+def column_values(index, column):
+    return list(index["columns"][column])
+
+
+def select_rows(index, selections, lo=0, hi=None):
+    # selections: {column: [values]}; rows must match any value of every
+    # column. Only rows in [lo, hi) are considered. Returns row positions.
+    hi = index["n_rows"] if hi is None else hi
+
+    if hi <= lo:
+        return np.array([], dtype=np.int64)
+
+    # Only touch the bytes covering [lo, hi)
+    first_byte, last_byte = lo // 8, (hi + 7) // 8
+    result = None
+
+    for column, values in selections.items():
+        bitmaps = index["columns"][column]
+
+        column_bits = np.zeros(last_byte - first_byte, dtype=np.uint8)
+        for value in values:
+            bitmap = bitmaps.get(value)
+            if bitmap is not None:
+                np.bitwise_or(column_bits, bitmap[first_byte:last_byte], out=column_bits)
+
+        if result is None:
+            result = column_bits
+        else:
+            np.bitwise_and(result, column_bits, out=result)
+
+    start = first_byte * 8
+
+    if result is None:
+        return np.arange(lo, hi)
+
+    rows = np.flatnonzero(np.unpackbits(result)) + start
+    return rows[(rows >= lo) & (rows < hi)]
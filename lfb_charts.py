@@ -0,0 +1,721 @@
+
+import matplotlib as mpl
+import numpy as np
+import seaborn as sns
+import squarify
+
+from lfb_aggregations import RESPONSE_BAND_LABELS
+from lfb_figures import chart, palette, reset, template
+
+#######################################################################################
+#######################################################################################
+
+# Chart definitions of the dashboard.
+#
+# Each chart is draw(fig, section): it draws the output of the matching
+# lfb_sections.py computation into a Figure handed out by the FigureManager
+# (lfb_figures.py). Template charts (monthly lines, heatmap, stacked bars)
+# build their artists on the first draw and afterwards only update their
+# data; the remaining charts clear the figure and redraw.
+
+MONTH_LABELS = ['Jan','Feb','Mar','Apr','May','Jun','Jul','Aug','Sep','Oct','Nov','Dec']
+
+#######################################################################################
+#######################################################################################
+
+
+def _incident_palette():
+    colorblind = palette("colorblind")
+    return {
+        "All Incidents": "black",
+        "False Alarm": colorblind[0],
+        "Fire": colorblind[1],
+        "Special Service": colorblind[2],
+    }
+
+
+def _draw_monthly_lines(fig, draw, section, value, plot_order, legend_order, title, ylabel):
+    by_type, total = section["by_type"], section["total"]
+
+    present = set(by_type["IncidentGroup"])
+    groups = [group for group in plot_order if group in present]
+
+    artists = template(fig)
+
+    if artists.get("groups") != groups:
+        ax = reset(fig, draw)
+        colors = _incident_palette()
+
+        lines = {}
+
+        # Plot all incident types EXCEPT totals
+        for group in groups:
+            lines[group], = ax.plot([], [], color=colors[group], linewidth=2.5, marker="o", label=group)
+
+        # Plot ALL INCIDENTS separately with thicker line
+        lines["All Incidents"], = ax.plot([], [], color="black", linewidth=4, marker="o", label="All Incidents")
+
+        ax.set_title(title, weight="bold")
+        ax.set_xlabel("Month")
+        ax.set_ylabel(ylabel)
+
+        ax.set_xticks(range(1, 13))
+        ax.set_xticklabels(MONTH_LABELS)
+
+        # Legend in the desired order, keeping only groups that are present
+        ordered_labels = [label for label in legend_order if label in lines]
+
+        ax.legend(
+            [lines[label] for label in ordered_labels],
+            ordered_labels,
+            title="Incident Group",
+            frameon=False
+        )
+
+        sns.despine(fig=fig)
+
+        artists.update(groups=groups, ax=ax, lines=lines)
+        built = True
+    else:
+        ax = artists["ax"]
+        built = False
+
+    for group, line in artists["lines"].items():
+        rows = total if group == "All Incidents" else by_type[by_type["IncidentGroup"] == group]
+        line.set_data(rows["CallMonth"].to_numpy(), rows[value].to_numpy())
+
+    ax.relim()
+    ax.autoscale_view()
+
+    if built:
+        fig.tight_layout()
+
+
+@chart(figsize=(12, 6))
+def monthly_trends_chart(fig, section):
+    _draw_monthly_lines(
+        fig, monthly_trends_chart, section,
+        value="IncidentCount",
+        plot_order=["False Alarm", "Special Service", "Fire"],
+        legend_order=["All Incidents", "False Alarm", "Special Service", "Fire"],
+        title="Monthly Incident Trends by Incident Type (2021–2025)",
+        ylabel="Number of Incidents",
+    )
+
+
+@chart(figsize=(9, 11))
+def hourly_heatmap_chart(fig, section):
+    daily_hourly_incidents = section["daily_hourly_incidents"]
+    values = np.ma.masked_invalid(daily_hourly_incidents.to_numpy(dtype=float))
+
+    artists = template(fig)
+
+    if "mesh" not in artists:
+        ax = reset(fig, hourly_heatmap_chart)
+
+        sns.heatmap(
+            daily_hourly_incidents,
+            cmap="coolwarm",
+            square=True,
+            linewidths=0.3,
+            linecolor="white",
+            cbar_kws={"label": "Number of Incidents"},
+            ax=ax
+        )
+
+        ax.invert_yaxis()  # 0 at bottom, 23 at top
+
+        ax.set_title("Daily and Hourly Incident Heatmap (2021–2025)", weight="bold")
+        ax.set_xlabel("Day of Week")
+        ax.set_ylabel("Hour of Call")
+
+        fig.tight_layout()
+
+        artists["mesh"] = ax.collections[0]
+        return
+
+    # Same 24 x 7 grid: swap the cell values and rescale the colour bar
+    mesh = artists["mesh"]
+    mesh.set_array(values.ravel())
+
+    if values.count():
+        mesh.set_clim(values.min(), values.max())
+    mesh.colorbar.update_normal(mesh)
+
+
+@chart(figsize=(12, 6))
+def monthly_response_chart(fig, section):
+    _draw_monthly_lines(
+        fig, monthly_response_chart, section,
+        value="AvgFirstPumpMinutes",
+        plot_order=["Fire", "Special Service", "False Alarm"],
+        legend_order=["All Incidents", "Special Service", "Fire", "False Alarm"],
+        title="Average Monthly First Pump Attendance Time by Incident Type (2021–2025)",
+        ylabel="Average First Pump Attendance Time (minutes)",
+    )
+
+#######################################################################################
+#######################################################################################
+
+
+@chart(figsize=(12, 12), nrows=2, sharex=True)
+def borough_response_chart(fig, section):
+    median_response_by_borough = section["median_response_by_borough"]
+
+    # Top / Bottom 10 selection, fastest on top, slowest at the bottom
+    fastest_sorted = median_response_by_borough.head(10).sort_values(
+        "MedianResponseMinutes",
+        ascending=True
+    )
+    slowest_sorted = median_response_by_borough.tail(10).sort_values(
+        "MedianResponseMinutes",
+        ascending=True
+    )
+
+    ax1, ax2 = reset(fig, borough_response_chart)
+
+    # top10 fastest boroughs
+
+    sns.barplot(
+        data=fastest_sorted,
+        y="IncGeo_BoroughName",
+        x="MedianResponseMinutes",
+        order=fastest_sorted["IncGeo_BoroughName"],
+        palette=list(palette("YlGn_r", len(fastest_sorted))),
+        ax=ax1
+    )
+
+    # Reference line
+    ax1.axvline(
+        x=6,
+        color="black",
+        linestyle="--",
+        linewidth=2
+    )
+
+    # Text left of the reference line
+    ax1.text(
+        5.95,
+        -0.5,
+        "6-minute response target",
+        fontsize=10,
+        ha="right",
+    )
+
+    ax1.set_title("Top 10 Fastest Boroughs (Median Response Time)",weight="bold")
+
+    ax1.set_xlabel("")
+    ax1.set_ylabel("")
+
+    # top10 slowest boroughs
+
+    sns.barplot(
+        data=slowest_sorted,
+        y="IncGeo_BoroughName",
+        x="MedianResponseMinutes",
+        order=slowest_sorted["IncGeo_BoroughName"],
+        palette=list(palette("YlOrRd", len(slowest_sorted))),
+        ax=ax2
+    )
+
+    ax2.axvline(6, color="black", linestyle="--", linewidth=2)
+
+    ax2.set_title("Top 10 Slowest Boroughs (Median Response Time)",weight="bold")
+
+    ax2.set_xlabel("Median Response Time (minutes)")
+    ax2.set_ylabel("")
+
+    sns.despine(fig=fig)
+    fig.tight_layout()
+
+
+@chart(figsize=(12, 12), nrows=2, sharex=True)
+def borough_compliance_chart(fig, section):
+    compliance_by_borough = section["compliance_by_borough"]
+
+    # Highest compliance at TOP; lowest compliance: "less bad" at top, worst at bottom
+    top10_sorted = compliance_by_borough.tail(10).sort_values(
+        "CompliancePercent",
+        ascending=False
+    )
+    bottom10_sorted = compliance_by_borough.head(10).sort_values(
+        "CompliancePercent",
+        ascending=False
+    )
+
+    ax1, ax2 = reset(fig, borough_compliance_chart)
+
+    # Highest Compliance
+
+    sns.barplot(
+        data=top10_sorted,
+        y="IncGeo_BoroughName",
+        x="CompliancePercent",
+        order=top10_sorted["IncGeo_BoroughName"],
+        palette=list(palette("YlGn_r", len(top10_sorted))),
+        ax=ax1
+    )
+
+    ax1.set_title("Top 10 Boroughs — Highest Compliance (%)", weight="bold")
+    ax1.set_xlabel("")
+    ax1.set_ylabel("")
+
+    # Lowest Compliance
+
+    sns.barplot(
+        data=bottom10_sorted,
+        y="IncGeo_BoroughName",
+        x="CompliancePercent",
+        order=bottom10_sorted["IncGeo_BoroughName"],
+        palette=list(palette("YlOrRd", len(bottom10_sorted))),
+        ax=ax2
+    )
+
+    ax2.set_title("Top 10 Boroughs — Lowest Compliance (%)", weight="bold")
+    ax2.set_xlabel("Compliance Rate (%)")
+    ax2.set_ylabel("")
+
+    ax2.set_xlim(0, 100)
+
+    sns.despine(fig=fig)
+    fig.tight_layout()
+
+#######################################################################################
+#######################################################################################
+
+
+def _update_stacked_bars(containers, segments):
+    # segments: list of per-container widths (same length as each container)
+    left = np.zeros(len(segments[0]))
+    for container, widths in zip(containers, segments):
+        for rect, x, width in zip(container.patches, left, widths):
+            rect.set_x(x)
+            rect.set_width(width)
+        left = left + np.asarray(widths, dtype=float)
+
+
+@chart(figsize=(12, 6))
+def response_bands_chart(fig, section):
+    band_pivot = section["band_pivot"]
+    groups = list(band_pivot.index)
+    segments = [band_pivot[band].to_numpy() for band in RESPONSE_BAND_LABELS]
+
+    artists = template(fig)
+
+    if artists.get("groups") == groups:
+        _update_stacked_bars(artists["containers"], segments)
+        return
+
+    ax = reset(fig, response_bands_chart)
+
+    colors = ["#2ca02c", "#ffdd57", "#ff8c42", "#d62728"]
+
+    containers = [
+        ax.barh(groups, np.zeros(len(groups)), color=colors[i], label=band)
+        for i, band in enumerate(RESPONSE_BAND_LABELS)
+    ]
+    _update_stacked_bars(containers, segments)
+
+    ax.set_xlim(0, 100)
+    ax.set_xlabel("Percentage of Incidents (%)")
+    ax.set_title("Response Time Distribution by Incident Type", weight="bold")
+
+    ax.legend(
+        title="Response Band",
+        loc="upper center",
+        bbox_to_anchor=(0.5, -0.12),
+        ncol=4,
+        frameon=False
+    )
+
+    sns.despine(fig=fig)
+    fig.tight_layout()
+
+    artists.update(groups=groups, containers=containers)
+
+
+def binned_histplot(ax, histogram):
+    # histplot of binned counts (see lfb_sections.histogram)
+    # A list: histplot compares bins with "auto"
+    edges = histogram["left"].tolist() + [histogram["right"].iloc[-1]]
+
+    sns.histplot(
+        x=(histogram["left"] + histogram["right"]) / 2,
+        weights=histogram["count"],
+        bins=edges,
+        kde=histogram["count"].sum() > 1,
+        ax=ax
+    )
+
+
+@chart(figsize=(10, 6))
+def attendance_histogram_chart(fig, section):
+    median, mean, p90 = section["median"], section["mean"], section["p90"]
+
+    ax = reset(fig, attendance_histogram_chart)
+
+    binned_histplot(ax, section["histogram"])
+
+    # Reference lines
+    ax.axvline(6, color="red", linestyle="--", linewidth=2, label="6-min target")
+    ax.axvline(median, color="black", linewidth=2, label=f"Median ({median:.2f})")
+    ax.axvline(mean, color="blue", linestyle="--", label=f"Mean ({mean:.2f})")
+    ax.axvline(p90, color="purple", linestyle=":", label=f"P90 ({p90:.2f})")
+
+    ax.set_title("Distribution of First Pump Attendance Time", weight="bold")
+    ax.set_xlabel("Attendance Time (minutes)")
+    ax.set_ylabel("Frequency")
+
+    ax.legend(frameon=False)
+
+    sns.despine(fig=fig)
+    fig.tight_layout()
+
+
+@chart(figsize=(8, 5))
+def attendance_bands_chart(fig, section):
+    band_distribution = section["band_distribution"]
+
+    ax = reset(fig, attendance_bands_chart)
+
+    sns.barplot(
+        x=band_distribution.index,
+        y=band_distribution.values,
+        palette="YlGnBu",
+        ax=ax
+    )
+
+    ax.set_title("Response Time Distribution Bands (%)", weight="bold")
+    ax.set_ylabel("Percentage of Incidents")
+    ax.set_xlabel("Response Time Band")
+
+    sns.despine(fig=fig)
+    fig.tight_layout()
+
+
+@chart(figsize=(10, 14), nrows=3, sharex=True)   # deutlich höher
+def distribution_by_type_chart(fig, section):
+    axes = reset(fig, distribution_by_type_chart)
+
+    for ax, (incident, histogram) in zip(axes, section["histograms"].items()):
+
+        binned_histplot(ax, histogram)
+
+        ax.axvline(6, color="red", linestyle="--", linewidth=2)
+
+        ax.set_title(incident, weight="bold")
+        ax.set_ylabel("Frequency")
+
+    axes[-1].set_xlabel("Attendance Time (minutes)")
+
+    sns.despine(fig=fig)
+    fig.tight_layout()
+
+#######################################################################################
+#######################################################################################
+
+
+@chart(figsize=(10, 6))
+def decomposition_chart(fig, section):
+    decomposition = section["decomposition"]
+    groups = list(decomposition["IncidentGroup"])
+    segments = [
+        decomposition["TurnoutPercent"].to_numpy(),
+        decomposition["TravelPercent"].to_numpy(),
+    ]
+
+    artists = template(fig)
+
+    if artists.get("groups") == groups:
+        _update_stacked_bars(artists["containers"], segments)
+        return
+
+    # Prepare stacked bar
+    ax = reset(fig, decomposition_chart)
+
+    colorblind = palette("colorblind")
+
+    containers = [
+        # Turnout
+        ax.barh(groups, np.zeros(len(groups)), color=colorblind[0], label="Turnout Time"),
+        # Travel
+        ax.barh(groups, np.zeros(len(groups)), color=colorblind[1], label="Travel Time"),
+    ]
+    _update_stacked_bars(containers, segments)
+
+    ax.set_xlim(0, 100)
+    ax.set_xlabel("Percentage of Total Response Time (%)")
+    ax.set_title("Turnout vs Travel Contribution by Incident Type", weight="bold")
+
+    ax.legend(
+        title="Component",
+        loc="upper center",
+        bbox_to_anchor=(0.5, -0.12),
+        ncol=2,
+        frameon=False
+    )
+
+    sns.despine(fig=fig)
+    fig.tight_layout()
+
+    artists.update(groups=groups, containers=containers)
+
+
+@chart(figsize=(15, 5), ncols=3, sharey=True)
+def percentile_decomposition_chart(fig, section):
+    by_group = section["by_group"]
+    percentiles = [column for column in by_group.columns if column.startswith("P")]
+
+    axes = reset(fig, percentile_decomposition_chart)
+
+    colorblind = palette("colorblind")
+
+    turnout = by_group[by_group["Component"] == "Turnout"].set_index("IncidentGroup")
+    travel = by_group[by_group["Component"] == "Travel"].set_index("IncidentGroup")
+    groups = list(turnout.index)
+    positions = np.arange(len(groups))
+
+    # Side by side, not stacked: component percentiles come from different
+    # incidents and do not add up to a response time percentile
+    for ax, percentile in zip(axes, percentiles):
+        ax.barh(positions - 0.2, turnout[percentile], height=0.4, color=colorblind[0], label="Turnout Time")
+        ax.barh(positions + 0.2, travel[percentile].reindex(groups), height=0.4, color=colorblind[1], label="Travel Time")
+
+        ax.set_yticks(positions, groups)
+        ax.set_title(percentile, weight="bold")
+        ax.set_xlabel("Minutes")
+
+    axes[1].legend(
+        title="Component",
+        loc="upper center",
+        bbox_to_anchor=(0.5, -0.18),
+        ncol=2,
+        frameon=False
+    )
+
+    sns.despine(fig=fig)
+    fig.tight_layout()
+
+
+@chart(figsize=(16, 8), ncols=2, width_ratios=[1, 1.4])
+def demand_forecast_chart(fig, section):
+    profile = section["profile"]
+    daily = section["daily"]
+
+    ax1, ax2 = reset(fig, demand_forecast_chart)
+
+    sns.heatmap(
+        profile,
+        cmap="coolwarm",
+        linewidths=0.3,
+        linecolor="white",
+        cbar_kws={"label": "Expected Incidents per Hour"},
+        ax=ax1
+    )
+
+    ax1.invert_yaxis()  # 0 at bottom, 23 at top
+
+    ax1.set_title("Expected Incidents by Hour and Weekday", weight="bold")
+    ax1.set_xlabel("Day of Week")
+    ax1.set_ylabel("Hour of Call")
+
+    ax2.plot(daily.index, daily.to_numpy(), marker="o", color=palette("colorblind")[0])
+
+    ax2.set_ylim(bottom=0)
+    ax2.set_title("Expected Incidents per Day", weight="bold")
+    ax2.set_xlabel("Date")
+    ax2.set_ylabel("Expected Incidents")
+    ax2.tick_params(axis="x", rotation=45)
+
+    sns.despine(ax=ax2)
+    fig.tight_layout()
+
+
+@chart(figsize=(16, 8))
+def extreme_delays_chart(fig, section):
+    pareto_df = section["pareto_df"]
+
+    ax1 = reset(fig, extreme_delays_chart)
+
+    sns.barplot(
+        data=pareto_df,
+        x="ShortLabel",
+        y="Percent",
+        palette="Reds_r",
+        ax=ax1
+    )
+
+    ax1.set_ylabel("Share of Extreme Delays (%)", fontsize=13)
+    ax1.set_xlabel("")
+    ax1.set_title(
+        "Pareto Analysis of Extreme Delay Drivers (>10 minutes)",
+        fontsize=16,
+        weight="bold"
+    )
+
+    ax1.tick_params(axis='x', labelsize=11)
+    ax1.tick_params(axis='y', labelsize=11)
+
+    for label in ax1.get_xticklabels():
+        label.set_rotation(45)
+        label.set_horizontalalignment("right")
+
+    # Add percentage labels on bars
+    for container in ax1.containers:
+        ax1.bar_label(container, fmt="%.1f%%", padding=3, fontsize=10)
+
+    # Cumulative line
+    ax2 = ax1.twinx()
+
+    ax2.plot(
+        pareto_df["ShortLabel"],
+        pareto_df["CumulativePercent"],
+        color="black",
+        marker="o",
+        linewidth=2
+    )
+
+    ax2.set_ylabel("Cumulative Share (%)", fontsize=13)
+    ax2.set_ylim(0, 100)
+    ax2.tick_params(axis='y', labelsize=11)
+
+    # 80% reference
+    ax2.axhline(80, linestyle="--", color="gray", alpha=0.6)
+
+    sns.despine(fig=fig)
+    fig.tight_layout()
+
+#######################################################################################
+#######################################################################################
+
+
+@chart(figsize=(16, 10))
+def volume_treemap_chart(fig, section):
+    volume = section["volume"]
+
+    ax = reset(fig, volume_treemap_chart)
+
+    # Boroughs laid out by total volume, their incident types nested inside
+    width, height = 100, 100
+    totals = volume.groupby("IncGeo_BoroughName")["Incidents"].sum().sort_values(ascending=False)
+
+    norm = mpl.colors.Normalize(volume["MedianResponse"].min(), volume["MedianResponse"].max())
+    cmap = mpl.colormaps["RdYlGn_r"]
+
+    borough_rects = squarify.squarify(squarify.normalize_sizes(totals.to_numpy(), width, height), 0, 0, width, height)
+
+    for borough, rect in zip(totals.index, borough_rects):
+        cells = volume[volume["IncGeo_BoroughName"] == borough].sort_values("Incidents", ascending=False)
+        cell_rects = squarify.squarify(
+            squarify.normalize_sizes(cells["Incidents"].to_numpy(), rect["dx"], rect["dy"]),
+            rect["x"], rect["y"], rect["dx"], rect["dy"]
+        )
+
+        for (_, cell), cell_rect in zip(cells.iterrows(), cell_rects):
+            ax.add_patch(mpl.patches.Rectangle(
+                (cell_rect["x"], cell_rect["y"]), cell_rect["dx"], cell_rect["dy"],
+                facecolor=cmap(norm(cell["MedianResponse"])) if not np.isnan(cell["MedianResponse"]) else "lightgrey",
+                edgecolor="white",
+                linewidth=0.5
+            ))
+
+            # Incident type labels only where they fit
+            if cell_rect["dx"] > 6 and cell_rect["dy"] > 3:
+                ax.text(
+                    cell_rect["x"] + 0.4, cell_rect["y"] + 0.4,
+                    f"{cell['IncidentGroup']}\n{cell['Incidents']:,}",
+                    fontsize=7, va="bottom", ha="left"
+                )
+
+        ax.add_patch(mpl.patches.Rectangle(
+            (rect["x"], rect["y"]), rect["dx"], rect["dy"],
+            fill=False, edgecolor="white", linewidth=2.5
+        ))
+
+        if rect["dx"] > 6 and rect["dy"] > 4:
+            ax.text(
+                rect["x"] + 0.4, rect["y"] + rect["dy"] - 0.4, borough,
+                fontsize=8, weight="bold", va="top", ha="left"
+            )
+
+    ax.set_xlim(0, width)
+    ax.set_ylim(0, height)
+    ax.set_axis_off()
+
+    fig.colorbar(
+        mpl.cm.ScalarMappable(norm=norm, cmap=cmap),
+        ax=ax,
+        label="Median First Pump Attendance Time (min)",
+        fraction=0.03
+    )
+
+    ax.set_title(
+        "Incident Volume by Borough and Incident Type (area: distinct incidents)",
+        weight="bold"
+    )
+
+    fig.tight_layout()
+
+
+@chart(figsize=(16, 6), ncols=2)
+def year_comparison_chart(fig, overlay, years):
+    ax1, ax2 = reset(fig, year_comparison_chart)
+
+    year_palette = dict(zip(years, palette("colorblind", len(years))))
+
+    sns.lineplot(
+        data=overlay,
+        x="CallMonth",
+        y="IncidentCount",
+        hue="Year",
+        palette=year_palette,
+        linewidth=2.5,
+        marker="o",
+        ax=ax1
+    )
+
+    ax1.set_title("Monthly Incidents", weight="bold")
+    ax1.set_ylabel("Number of Incidents")
+
+    sns.lineplot(
+        data=overlay,
+        x="CallMonth",
+        y="AvgFirstPumpMinutes",
+        hue="Year",
+        palette=year_palette,
+        linewidth=2.5,
+        marker="o",
+        ax=ax2
+    )
+
+    ax2.axhline(6, color="black", linestyle="--", linewidth=1.5)
+    ax2.set_title("Average First Pump Attendance Time (minutes)", weight="bold")
+    ax2.set_ylabel("Minutes")
+
+    for ax in (ax1, ax2):
+        ax.set_xlabel("Month")
+        ax.set_xticks(range(1, 13))
+        ax.set_xticklabels(MONTH_LABELS)
+        ax.legend(title="Year", frameon=False)
+
+    sns.despine(fig=fig)
+    fig.tight_layout()
+
+#######################################################################################
+#######################################################################################
+
+# Section name -> chart builders, in page order
+CHARTS = {
+    "monthly_trends": [monthly_trends_chart],
+    "hourly_heatmap": [hourly_heatmap_chart],
+    "monthly_response": [monthly_response_chart],
+    "borough_response": [borough_response_chart],
+    "borough_compliance": [borough_compliance_chart],
+    "response_bands": [response_bands_chart],
+    "attendance_distribution": [attendance_histogram_chart, attendance_bands_chart],
+    "distribution_by_type": [distribution_by_type_chart],
+    "decomposition": [decomposition_chart],
+    "percentile_decomposition": [percentile_decomposition_chart],
+    "extreme_delays": [extreme_delays_chart],
+    "volume_treemap": [volume_treemap_chart],
+}
@@ -0,0 +1,102 @@
+
+import pandas as pd
+
+import lfb_aggregations as agg
+import lfb_timeindex as timeindex
+
+#######################################################################################
+#######################################################################################
+
+# Multi-year comparison built from per-year aggregates.
+#
+# `year_aggregates` computes everything the comparison view needs for ONE
+# year; the dashboard caches it per year, so adding a year to a comparison
+# costs a cache lookup plus the cheap merges below.
+
+KPI_LABELS = {
+    "total_incidents": "Total Incidents",
+    "median_response": "Median Response Time (min)",
+    "response_within_6min": "Response within 6 min (%)",
+    "false_alarm_rate": "False Alarm Rate (%)",
+    "fire_rate": "Fire Rate (%)",
+    "special_service_rate": "Special Service Rate (%)",
+    "p90_response": "90th Percentile Response Time (min)",
+    "avg_response": "Average Response Time (min)",
+    "second_pump_rate": "Second Pump Deployment Rate (%)",
+    "avg_pumps": "Average Pumps Attending",
+}
+
+# KPIs where a decrease is an improvement (drives st.metric delta colours)
+LOWER_IS_BETTER = {"median_response", "p90_response", "avg_response", "false_alarm_rate"}
+
+#######################################################################################
+#######################################################################################
+
+
+def year_aggregates(df, year, backend=None):
+    # df is sorted by CallDate, so a year is a contiguous slice
+    year_df = timeindex.year_slice(df, year)
+
+    return {
+        "kpis": agg.compute_kpis(year_df, backend),
+        "monthly_incidents": agg.monthly_incidents_total(year_df, backend),
+        "monthly_response": agg.avg_firstpump_attendance_total(year_df, backend),
+        "median_response_by_borough": agg.median_response_by_borough(year_df, backend),
+    }
+
+
+def _stack(per_year, key):
+    frames = []
+    for year, aggregates in per_year.items():
+        frame = aggregates[key].copy()
+        frame["Year"] = year
+        frames.append(frame)
+    return pd.concat(frames, ignore_index=True)
+
+
+def monthly_overlay(per_year):
+    # Long format: CallMonth, Year, IncidentCount, AvgFirstPumpMinutes
+    incidents = _stack(per_year, "monthly_incidents")
+    response = _stack(per_year, "monthly_response")
+    return incidents.merge(response, on=["CallMonth", "Year"], how="outer")
+
+
+def kpi_deltas(per_year):
+    # One row per KPI, one column per year, plus the change from the first
+    # selected year to the last one
+    table = pd.DataFrame({year: aggregates["kpis"] for year, aggregates in per_year.items()})
+
+    years = list(per_year)
+    first, last = years[0], years[-1]
+
+    table["Change"] = table[last] - table[first]
+    table["Change (%)"] = table["Change"] / table[first] * 100
+
+    table.index = [KPI_LABELS[kpi] for kpi in table.index]
+    table.columns = [str(column) for column in table.columns]
+    return table
+
+
+def borough_rank_changes(per_year):
+    # Rank 1 = fastest median first pump attendance in that year
+    ranks = []
+    for year, aggregates in per_year.items():
+        borough = aggregates["median_response_by_borough"].set_index("IncGeo_BoroughName")
+        ranks.append(
+            borough["MedianResponseMinutes"]
+            .rank(method="min")
+            .astype("Int64")
+            .rename(year)
+        )
+
+    table = pd.concat(ranks, axis=1)
+
+    years = list(per_year)
+    first, last = years[0], years[-1]
+
+    # Positive = climbed the ranking (got relatively faster)
+    table["RankChange"] = table[first] - table[last]
+
+    table = table.sort_values(last).rename_axis("Borough")
+    table.columns = [str(column) for column in table.columns]
+    return table
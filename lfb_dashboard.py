@@ -1,9 +1,35 @@
 
+import time
+
+# Start of the script run, for the time-to-first-paint measurement and the
+# per-session CPU report
+script_started = time.perf_counter()
+script_cpu_started = time.thread_time()
+
+import importlib
+import io
+import os
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
 import streamlit as st
+import numpy as np
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
-import squarify
+
+import lfb_aggregations as agg
+import lfb_anomalies as anomalies
+import lfb_bitmap as bitmap
+import lfb_comparison as comparison
+import lfb_data as data
+import lfb_diskcache as diskcache
+import lfb_export as export
+import lfb_forecast as forecast
+import lfb_quality as quality
+import lfb_sections as sections
+import lfb_shared as shared
+import lfb_timeindex as timeindex
+from lfb_backend import available_backends, get_backend
+from lfb_figures import figures
 
 st.set_page_config(layout="wide")
 st.title("🚒 London Fire Brigade Incident & Response Time Analysis")
@@ -11,774 +37,693 @@ st.title("🚒 London Fire Brigade Incident & Response Time Analysis")
 #######################################################################################
 #######################################################################################
 
-@st.cache_data
-def load_data():
-    return pd.read_parquet("lfb_streamlit.parquet")
-
-df = load_data()
-
-# Feature Engineering
-
-# Convert to datetime 
-df["CallDate"] = pd.to_datetime(df["CallDate"])
-
-# Create time features (needed for Daily and Hourly Incident Heatmap)
-df["HourOfCall"] = pd.to_datetime(df["TimeOfCall"]).dt.hour
-df["CallWeekday"] = pd.to_datetime(df["CallDate"]).dt.day_name()
+# Draw a chart into a pooled figure and render it while it is checked out.
+# The plotting modules (matplotlib, seaborn) are imported on the first chart.
+# With a cache key, the rendered PNG (st.pyplot's settings) is stored in the
+# disk cache and later runs, sessions and processes show it without drawing.
+def show_chart(name, *args, cache_key=None):
+    png = disk_cache().get(cache_key) if cache_key is not None else None
 
-# Extract year and month
-df["Year"] = df["CallDate"].dt.year
-df["Month"] = df["CallDate"].dt.month
-df["MonthName"] = df["CallDate"].dt.month_name()
-df["CallMonth"] = df["CallDate"].dt.month
+    if png is None:
+        draw = getattr(importlib.import_module("lfb_charts"), name)
+        with figures.draw(draw, *args) as fig:
+            if cache_key is None:
+                st.pyplot(fig)
+                return
+            buffer = io.BytesIO()
+            fig.savefig(buffer, format="png", dpi=200, bbox_inches="tight")
+            png = buffer.getvalue()
+        disk_cache().put(cache_key, png)
 
-# Identify incidents where the first pump arrived within the 6-minute response target
-df["FirstPump_Within_6min"] = df["FirstPumpArriving_AttendanceTime"] <= 360
+    st.image(png, width="stretch")
 
-#######################################################################################
-#######################################################################################
+def render_demand_kpis(kpis):
+    col1, col2, col3 = st.columns(3)
 
-st.sidebar.header("Filters")
+    col1.metric("Total Incidents", f"{kpis['total_incidents']:,}")
+    col2.metric("Median Response Time (min)", f"{kpis['median_response']:.2f}")
+    col3.metric("Response within 6 min (%)", f"{kpis['response_within_6min']:.1f}")
 
-# Available years
-available_years = ["All"] + sorted(df["Year"].unique())
+    col4, col5, col6 = st.columns(3)
 
-# Available months (mit All Option)
-available_months = ["All"] + [
-    "January","February","March","April","May","June",
-    "July","August","September","October","November","December"
-]
+    col4.metric("False Alarm Rate (%)", f"{kpis['false_alarm_rate']:.1f}")
+    col5.metric("Fire Rate (%)", f"{kpis['fire_rate']:.1f}")
+    col6.metric("Special Service Rate (%)", f"{kpis['special_service_rate']:.1f}")
 
-# Year filter
-selected_year = st.sidebar.selectbox(
-    "Select Year",
-    options=available_years
-)
+def render_operational_kpis(kpis):
+    col7, col8, col9, col10 = st.columns(4)
 
-# Month filter
-selected_month = st.sidebar.selectbox(
-    "Select Month",
-    options=available_months
-)
+    col7.metric("90th Percentile Response Time (min)", f"{kpis['p90_response']:.2f}")
+    col8.metric("Average Response Time (min)", f"{kpis['avg_response']:.2f}")
+    col9.metric("Second Pump Deployment Rate (%)", f"{kpis['second_pump_rate']:.1f}")
+    col10.metric("Average Pumps Attending", f"{kpis['avg_pumps']:.2f}")
 
-# Apply Filters
-if selected_year == "All" and selected_month == "All":
-    filtered_df = df.copy()
+def render_kpis(kpis):
+    st.subheader("Key Performance Indicators")
+    render_demand_kpis(kpis)
 
-elif selected_year == "All":
-    filtered_df = df[df["MonthName"] == selected_month]
+    st.subheader("Operational KPIs")
+    render_operational_kpis(kpis)
+
+#######################################################################################
+#######################################################################################
+
+# The dataset loads and is feature-engineered once per process, in a
+# background thread, so a cold start can paint before it is ready
+@st.cache_resource
+def start_background_load():
+    executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="lfb-load")
+    future = executor.submit(data.load_prepared_data_with_summary)
+    executor.shutdown(wait=False)
+    return future
+
+# The prepared frame is shared read-only between reruns and sessions
+# (filters below never modify it in place)
+@st.cache_resource
+def load_prepared_data():
+    future = start_background_load()
+    if future.exception() is not None:
+        start_background_load.clear()  # retry on the next run
+    return future.result()[0]
+
+# Quality summary and quarantined rows of the load (see lfb_quality.py)
+@st.cache_resource
+def load_quality_report():
+    return start_background_load().result()[1]
+
+first_paint = None
+loading = start_background_load()
+
+if not loading.done():
+    summary = data.read_summary()
+
+    if summary is not None:
+        # Cold start: KPI header of the unfiltered view from the summary file
+        cold_header = st.empty()
+
+        with cold_header.container():
+            st.caption("Data shown: All Years | All Months · loading full dataset…")
+            render_kpis(summary["kpis"])
+
+        first_paint = time.perf_counter() - script_started
+
+with st.spinner("Loading incident data…"):
+    try:
+        df = load_prepared_data()
+    except quality.SchemaError as error:
+        # Schema check failed: missing columns or columns of the wrong kind
+        st.error(f"The incident dataset failed validation: {error}")
+        st.stop()
+
+if first_paint is not None:
+    cold_header.empty()
+
+data_ready = time.perf_counter() - script_started
+
+def report_timings():
+    # Returns the placeholder for the CPU report, filled at the end of the run
+    with st.sidebar.expander("Performance"):
+        st.caption(f"Time to first paint: {first_paint:.2f}s")
+        st.caption(f"Dataset ready: {data_ready:.2f}s")
+
+        cache_entries, cache_bytes = disk_cache().size()
+        st.caption(f"Disk cache: {cache_entries} entries, {cache_bytes / 1024 ** 2:.1f} MB")
+
+        return st.empty()
+
+def report_cpu(placeholder):
+    # Charge this run's script CPU time to the session, then show the totals
+    # of this session and of every recent session of the process
+    computations.record_script_run(session_id, time.thread_time() - script_cpu_started)
+    sessions_report = computations.session_report()
+    session = sessions_report.loc[session_id]
+
+    with placeholder.container():
+        st.caption(
+            f"CPU this session: {session['cpu_seconds']:.2f}s over {session['runs']} run(s) "
+            f"(script {session['script_cpu_seconds']:.2f}s, "
+            f"computations {session['compute_cpu_seconds']:.2f}s)"
+        )
+        st.caption(
+            f"Sections computed: {session['computed']}, shared with other sessions: "
+            f"{session['joined']} in flight, {session['cached']} finished"
+        )
+        st.dataframe(
+            sessions_report[["runs", "cpu_seconds", "computed", "joined", "cached"]].round(2),
+            width="stretch"
+        )
+
+# Daily pre-aggregates serving the KPI block for any date window
+@st.cache_resource
+def load_daily_aggregates():
+    return timeindex.build_daily_aggregates(load_prepared_data())
+
+daily_aggregates = load_daily_aggregates()
+
+# Day x borough x incident group pre-aggregates serving the volume treemap
+# for any date window
+@st.cache_resource
+def load_borough_group_daily():
+    return agg.build_borough_group_daily(load_prepared_data())
+
+borough_group_daily = load_borough_group_daily()
+
+# Per-value bitmap indexes for the sidebar dimension filters
+@st.cache_resource
+def load_bitmap_index():
+    return bitmap.build_bitmap_index(load_prepared_data(), data.BITMAP_COLUMNS)
+
+bitmap_index = load_bitmap_index()
+
+# Daily anomaly scores per area, built once from the prepared frame
+@st.cache_resource
+def load_anomalies():
+    return anomalies.update_anomalies(None, load_prepared_data())
+
+# Worker threads computing the page sections while the KPIs and the earlier
+# charts are drawn (shared by all sessions)
+@st.cache_resource
+def section_pool():
+    return ThreadPoolExecutor(
+        max_workers=min(len(sections.SECTIONS), os.cpu_count() or 1),
+        thread_name_prefix="lfb-section"
+    )
 
-elif selected_month == "All":
-    filtered_df = df[df["Year"] == selected_year]
+# Persistent cache of section results and chart images, shared by restarts
+# and by every process on the node (see lfb_diskcache.py). Keys start with
+# the content hash of the dataset file.
+@st.cache_resource
+def disk_cache():
+    return diskcache.DiskCache()
 
-else:
-    filtered_df = df[
-        (df["Year"] == selected_year) &
-        (df["MonthName"] == selected_month)
-    ]
+@st.cache_resource
+def dataset_hash():
+    return diskcache.file_hash(data.DATA_PATH)
 
-if filtered_df.empty:
-    st.warning("No data available for selected filters.")
-    st.stop()
+# Section results shared by all sessions: concurrent requests for the same
+# (filter state, section) run once (see lfb_shared.py)
+@st.cache_resource
+def shared_computations():
+    return shared.SharedComputations(section_pool())
 
-if selected_year == "All":
-    year_text = "All Years"
-else:
-    year_text = selected_year
+computations = shared_computations()
+session_id = st.session_state.setdefault("session_id", uuid.uuid4().hex[:8])
 
-if selected_month == "All":
-    month_text = "All Months"
-else:
-    month_text = selected_month
+# Demand forecast month statistics per dimension selection: a new date
+# window only fits the months it has not seen (see lfb_forecast.py). The
+# store is shared by the pool threads of every session, hence its lock.
+@st.cache_resource
+def forecast_statistics():
+    return shared.StatisticsStore()
 
-st.caption(f"Data shown: {year_text} | {month_text}")
+def compute_forecast(rows, store, selection):
+    result, statistics = forecast.demand_forecast(rows, store.get(selection))
+    store.put(selection, statistics)
+    return result
 
-#######################################################################################
-#######################################################################################
+# Per-year aggregates for the comparison view. The frame is excluded from
+# hashing (leading underscore), so each year is cached under (year, engine).
+@st.cache_data(show_spinner=False)
+def load_year_aggregates(_df, year, backend_name):
+    return comparison.year_aggregates(_df, year, get_backend(backend_name))
 
-# KPI Calculations
-total_incidents = len(filtered_df)
-median_response = filtered_df["FirstPumpArriving_AttendanceTime"].median() / 60
-response_within_6min = ((filtered_df["FirstPumpArriving_AttendanceTime"] <= 360).mean() * 100)
-false_alarm_rate = (filtered_df["IncidentGroup"] == "False Alarm").mean() * 100
-fire_rate = (filtered_df["IncidentGroup"] == "Fire").mean() * 100
-special_service_rate = (filtered_df["IncidentGroup"] == "Special Service").mean() * 100
-p90_response = filtered_df["FirstPumpArriving_AttendanceTime"].quantile(0.90) / 60
-avg_response = filtered_df["FirstPumpArriving_AttendanceTime"].mean() / 60
-second_pump_rate = filtered_df["SecondPumpArriving_AttendanceTime"].notna().mean() * 100
-avg_pumps = filtered_df["NumPumpsAttending"].mean()
-   
 #######################################################################################
 #######################################################################################
 
-# Display KPIs
-st.subheader("Key Performance Indicators")
-
-col1, col2, col3 = st.columns(3)
+st.sidebar.header("Filters")
 
-col1.metric("Total Incidents", f"{total_incidents:,}")
-col2.metric("Median Response Time (min)", f"{median_response:.2f}")
-col3.metric("Response within 6 min (%)", f"{response_within_6min:.1f}")
+view_mode = st.sidebar.radio(
+    "View",
+    options=["Single Period", "Compare Years"],
+    horizontal=True
+)
 
-col4, col5, col6 = st.columns(3)
+# Query engine for the aggregation layer (pandas is the reference)
+selected_backend = st.sidebar.selectbox(
+    "Query Engine",
+    options=available_backends()
+)
 
-col4.metric("False Alarm Rate (%)", f"{false_alarm_rate:.1f}")
-col5.metric("Fire Rate (%)", f"{fire_rate:.1f}")
-col6.metric("Special Service Rate (%)", f"{special_service_rate:.1f}")
+backend = get_backend(selected_backend)
 
-st.subheader("Operational KPIs")
+#######################################################################################
+#######################################################################################
 
-col7, col8, col9, col10 = st.columns(4)
+if view_mode == "Compare Years":
 
-col7.metric("90th Percentile Response Time (min)", f"{p90_response:.2f}")
-col8.metric("Average Response Time (min)", f"{avg_response:.2f}")
-col9.metric("Second Pump Deployment Rate (%)", f"{second_pump_rate:.1f}")
-col10.metric("Average Pumps Attending", f"{avg_pumps:.2f}")
+    all_years = sorted(int(year) for year in df["Year"].unique())
 
-#######################################################################################
-#######################################################################################
+    compare_years = st.sidebar.multiselect(
+        "Select Years",
+        options=all_years,
+        default=all_years[-2:]
+    )
 
-st.subheader("Monthly Incident Trends by Incident Type")
+    if len(compare_years) < 2:
+        st.info("Select at least two years to compare.")
+        st.stop()
 
-# Monthly unique incident counts by incident type
-monthly_incidents_by_type = (
-    filtered_df
-    .groupby(["CallMonth", "IncidentGroup"])["IncidentNumber"]
-    .nunique()
-    .reset_index(name="IncidentCount")
-)
+    compare_years = sorted(compare_years)
 
-# Monthly unique incident counts across all incident types
-monthly_incidents_total = (
-    filtered_df
-    .groupby("CallMonth")["IncidentNumber"]
-    .nunique()
-    .reset_index(name="IncidentCount")
-)
+    # One cache lookup per year; only newly added years are computed
+    per_year = {
+        year: load_year_aggregates(df, year, selected_backend)
+        for year in compare_years
+    }
 
-# Label totals so they can be plotted together with incident types
-monthly_incidents_total["IncidentGroup"] = "All Incidents"
+    baseline_year, latest_year = compare_years[0], compare_years[-1]
 
-# Combine into long format
-monthly_incident_counts_long = pd.concat(
-    [monthly_incidents_by_type, monthly_incidents_total],
-    ignore_index=True
-)
+    st.caption(
+        f"Comparing: {', '.join(str(year) for year in compare_years)} "
+        f"| changes shown {baseline_year} → {latest_year}"
+    )
 
-palette = {
-    "All Incidents": "black",
-    "False Alarm": sns.color_palette("colorblind")[0],
-    "Fire": sns.color_palette("colorblind")[1],
-    "Special Service": sns.color_palette("colorblind")[2],
-}
+    #######################################################################################
 
-sns.set_theme(style="white")  # removes grid automatically
-
-fig, ax = plt.subplots(figsize=(12, 6))
-
-hue_order = [
-    "All Incidents",
-    "False Alarm",
-    "Special Service",
-    "Fire"
-]
-
-# Plot all incident types EXCEPT totals
-sns.lineplot(
-    data=monthly_incident_counts_long[monthly_incident_counts_long["IncidentGroup"] != "All Incidents"],
-    x="CallMonth",
-    y="IncidentCount",
-    hue="IncidentGroup",
-    hue_order=hue_order[1:],  # exclude All Incidents
-    palette=palette,
-    linewidth=2.5,
-    marker="o",
-    ax=ax
-)
+    st.subheader("Key Performance Indicators: Year-over-Year")
 
-# Plot ALL INCIDENTS separately with thicker line
-sns.lineplot(
-    data=monthly_incident_counts_long[monthly_incident_counts_long["IncidentGroup"] == "All Incidents"],
-    x="CallMonth",
-    y="IncidentCount",
-    color="black",
-    linewidth=4,
-    marker="o",
-    label="All Incidents",
-    ax=ax
-)
+    kpi_table = comparison.kpi_deltas(per_year)
+    baseline_kpis = per_year[baseline_year]["kpis"]
+    latest_kpis = per_year[latest_year]["kpis"]
 
-ax.set_title("Monthly Incident Trends by Incident Type (2021–2025)", weight="bold")
-ax.set_xlabel("Month")
-ax.set_ylabel("Number of Incidents")
+    kpi_columns = st.columns(5)
 
-ax.set_xticks(range(1, 13))
-ax.set_xticklabels(['Jan','Feb','Mar','Apr','May','Jun','Jul','Aug','Sep','Oct','Nov','Dec'])
+    for i, (kpi, label) in enumerate(comparison.KPI_LABELS.items()):
+        value = latest_kpis[kpi]
+        delta = value - baseline_kpis[kpi]
 
-# Get current handles and labels
-handles, labels = ax.get_legend_handles_labels()
+        if kpi == "total_incidents":
+            value_text, delta_text = f"{value:,}", f"{delta:+,}"
+        else:
+            value_text, delta_text = f"{value:.2f}", f"{delta:+.2f}"
 
-# Desired order
-desired_order = [
-    "All Incidents",
-    "False Alarm",
-    "Special Service",
-    "Fire"
-]
+        kpi_columns[i % 5].metric(
+            label,
+            value_text,
+            delta_text,
+            delta_color="inverse" if kpi in comparison.LOWER_IS_BETTER else "normal"
+        )
 
-# Reorder legend
-ordered_handles = [handles[labels.index(label)] for label in desired_order]
+    st.dataframe(kpi_table.style.format("{:,.2f}"), width="stretch")
 
-ax.legend(
-    ordered_handles,
-    desired_order,
-    title="Incident Group",
-    frameon=False
-)
+    #######################################################################################
 
-sns.despine()
+    st.subheader("Monthly Trends: Year-over-Year")
 
-fig.tight_layout()
+    overlay = comparison.monthly_overlay(per_year)
 
-st.pyplot(fig)
+    show_chart("year_comparison_chart", overlay, compare_years)
 
-#######################################################################################
-#######################################################################################
+    #######################################################################################
 
-st.subheader("Daily and Hourly Incident Heatmap")
+    st.subheader("Borough Ranking Changes (Median Response Time)")
 
-# Pivot table: weekday x hour
-daily_hourly_incidents = filtered_df.pivot_table(
-    index="HourOfCall",
-    columns="CallWeekday",
-    values="IncidentNumber",
-    aggfunc="nunique"
-)
+    rank_changes = comparison.borough_rank_changes(per_year)
 
-# Order by Weekday
-weekday_order = [
-"Monday", "Tuesday", "Wednesday",
-    "Thursday", "Friday", "Saturday", "Sunday"
-]
+    st.caption(
+        f"Rank 1 = fastest borough. Positive change = borough moved up the ranking "
+        f"between {baseline_year} and {latest_year}."
+    )
 
-daily_hourly_incidents = (
-    daily_hourly_incidents
-    .reindex(index=range(24))          # hours 0–23
-    .reindex(columns=weekday_order)    # Monday → Sunday
-)
+    col1, col2 = st.columns(2)
 
-fig, ax = plt.subplots(figsize=(9, 11))
+    col1.markdown("**Biggest Improvers**")
+    col1.dataframe(
+        rank_changes.sort_values("RankChange", ascending=False).head(10),
+        width="stretch"
+    )
 
-sns.heatmap(
-    daily_hourly_incidents,
-    cmap="coolwarm",
-    square=True,
-    linewidths=0.3,
-    linecolor="white",
-    cbar_kws={"label": "Number of Incidents"},
-    ax=ax
-)
+    col2.markdown("**Biggest Decliners**")
+    col2.dataframe(
+        rank_changes.sort_values("RankChange").head(10),
+        width="stretch"
+    )
 
-ax.invert_yaxis()  # 0 at bottom, 23 at top
+    with st.expander("Full borough ranking"):
+        st.dataframe(rank_changes, width="stretch")
 
-ax.set_title("Daily and Hourly Incident Heatmap (2021–2025)", weight="bold")
-ax.set_xlabel("Day of Week")
-ax.set_ylabel("Hour of Call")
+    if first_paint is None:
+        first_paint = time.perf_counter() - script_started
 
-fig.tight_layout()
+    report_cpu(report_timings())
 
-st.pyplot(fig)
+    st.stop()
 
 #######################################################################################
 #######################################################################################
 
-st.subheader("Monthly Response Performance by Incident Type")
-
-avg_firstpump_attendance_by_type = (
-    filtered_df
-    .groupby(["CallMonth", "IncidentGroup"])["FirstPumpArriving_AttendanceTime"]
-    .mean()
-    .div(60)
-    .reset_index(name="AvgFirstPumpMinutes")
-)
-
-avg_firstpump_attendance_total = (
-    filtered_df
-    .groupby("CallMonth")["FirstPumpArriving_AttendanceTime"]
-    .mean()
-    .div(60)
-    .reset_index(name="AvgFirstPumpMinutes")
+filter_mode = st.sidebar.radio(
+    "Filter By",
+    options=["Year / Month", "Date Range"],
+    horizontal=True
 )
 
-avg_firstpump_attendance_total["IncidentGroup"] = "All Incidents"
-
-avg_firstpump_attendance_long = pd.concat(
-    [avg_firstpump_attendance_by_type, avg_firstpump_attendance_total],
-    ignore_index=True
-)
+first_date = df["CallDate"].iloc[0].date()
+last_date = df["CallDate"].iloc[-1].date()
 
-palette = {
-    "All Incidents": "black",
-    "False Alarm": sns.color_palette("colorblind")[0],
-    "Fire": sns.color_palette("colorblind")[1],
-    "Special Service": sns.color_palette("colorblind")[2],
-}
+# (start, end) of the selection when it is one contiguous date window,
+# None otherwise (a month across all years, or dimension filters applied)
+date_window = None
 
-hue_order = ["Fire", "Special Service", "False Alarm", "All Incidents"]
-
-sns.set_theme(style="white")  # removes background grid
-
-fig, ax = plt.subplots(figsize=(12, 6))
-
-# Plot incident types
-sns.lineplot(
-    data=avg_firstpump_attendance_long[
-        avg_firstpump_attendance_long["IncidentGroup"] != "All Incidents"
-    ],
-    x="CallMonth",
-    y="AvgFirstPumpMinutes",
-    hue="IncidentGroup",
-    hue_order=hue_order[:-1],
-    palette=palette,
-    linewidth=2.5,
-    marker="o",
-    ax=ax
-)
+# Dimension selections resolved through the bitmap index: {column: [values]}
+selections = {}
 
-# Plot ALL incidents separately thicker
-sns.lineplot(
-    data=avg_firstpump_attendance_long[
-        avg_firstpump_attendance_long["IncidentGroup"] == "All Incidents"
-    ],
-    x="CallMonth",
-    y="AvgFirstPumpMinutes",
-    color="black",
-    linewidth=4,
-    marker="o",
-    label="All Incidents",
-    ax=ax
-)
+if filter_mode == "Date Range":
 
-ax.set_title("Average Monthly First Pump Attendance Time by Incident Type (2021–2025)", weight="bold")
-ax.set_xlabel("Month")
-ax.set_ylabel("Average First Pump Attendance Time (minutes)")
-
-ax.set_xticks(range(1, 13))
-ax.set_xticklabels(['Jan','Feb','Mar','Apr','May','Jun','Jul','Aug','Sep','Oct','Nov','Dec'])
-
-# Get current legend handles and labels
-handles, labels = ax.get_legend_handles_labels()
-
-# Desired order
-desired_order = [
-    "All Incidents",
-    "Special Service",
-    "Fire",
-    "False Alarm"
-]
-
-# Keep only labels that are actually present
-ordered_labels = [label for label in desired_order if label in labels]
-ordered_handles = [handles[labels.index(label)] for label in ordered_labels]
-
-ax.legend(
-    ordered_handles,
-    ordered_labels,
-    title="Incident Group",
-    frameon=False
-)
-sns.despine()
+    selected_dates = st.sidebar.date_input(
+        "Select Date Range",
+        value=(first_date, last_date),
+        min_value=first_date,
+        max_value=last_date
+    )
 
-fig.tight_layout()
+    if len(selected_dates) != 2:
+        st.info("Select an end date for the range.")
+        st.stop()
 
-st.pyplot(fig)
+    start_date, end_date = selected_dates
+    date_window = (start_date, end_date)
 
-#######################################################################################
-#######################################################################################
+    data_shown = f"{start_date:%d %b %Y} – {end_date:%d %b %Y}"
 
+else:
 
+    # Available years
+    available_years = ["All"] + sorted(df["Year"].unique())
 
-#######################################################################################
-#######################################################################################
+    # Available months (mit All Option)
+    available_months = ["All"] + [
+        "January","February","March","April","May","June",
+        "July","August","September","October","November","December"
+    ]
 
+    # Year filter
+    selected_year = st.sidebar.selectbox(
+        "Select Year",
+        options=available_years
+    )
 
-st.subheader("Response Performance by Borough")
+    # Month filter
+    selected_month = st.sidebar.selectbox(
+        "Select Month",
+        options=available_months
+    )
 
-# Calculate median response time by borough
+    selected_month_number = available_months.index(selected_month)
 
-median_response_by_borough = (
-    filtered_df
-    .groupby("IncGeo_BoroughName")["FirstPumpArriving_AttendanceTime"]
-    .median()
-    .div(60)
-    .reset_index(name="MedianResponseMinutes")
-    .sort_values("MedianResponseMinutes")
-)
+    # Apply Filters
+    date_window, selections = timeindex.year_month_selection(
+        first_date, last_date, selected_year, selected_month_number or None
+    )
 
-# Top / Bottom 10 selection
-top10_fastest = median_response_by_borough.head(10)
-top10_slowest = median_response_by_borough.tail(10)
+    if selected_year == "All":
+        year_text = "All Years"
+    else:
+        year_text = selected_year
 
+    if selected_month == "All":
+        month_text = "All Months"
+    else:
+        month_text = selected_month
 
-# sort
+    data_shown = f"{year_text} | {month_text}"
 
-# fastest on top
-fastest_sorted = top10_fastest.sort_values(
-    "MedianResponseMinutes",
-    ascending=True
-)
+#######################################################################################
 
-# slowest at the bottom
-slowest_sorted = top10_slowest.sort_values(
-    "MedianResponseMinutes",
-    ascending=True
-)
+with st.sidebar.expander("More Filters"):
 
+    selected_groups = st.multiselect(
+        "Incident Group",
+        options=bitmap.column_values(bitmap_index, "IncidentGroup")
+    )
 
-# Plot
+    selected_boroughs = st.multiselect(
+        "Borough",
+        options=bitmap.column_values(bitmap_index, "IncGeo_BoroughName")
+    )
 
+    selected_hours = st.slider(
+        "Hour of Call",
+        min_value=0,
+        max_value=23,
+        value=(0, 23)
+    )
 
-sns.set_theme(style="white")
+    selected_delays = st.multiselect(
+        "Delay Code",
+        options=bitmap.column_values(bitmap_index, "DelayCode_Description")
+    )
 
-fig, (ax1, ax2) = plt.subplots(
-    2, 1,
-    figsize=(12, 12),
-    sharex=True
+progressive = st.sidebar.toggle(
+    "Progressive rendering",
+    value=True,
+    help=(
+        "On: show the KPIs first and compute all charts in the background, each shown "
+        "as soon as its data is ready. Off: compute each chart in turn as the page is drawn."
+    )
 )
 
+dimension_filters = {
+    "IncidentGroup": selected_groups,
+    "IncGeo_BoroughName": selected_boroughs,
+    "HourOfCall": list(range(selected_hours[0], selected_hours[1] + 1)) if selected_hours != (0, 23) else [],
+    "DelayCode_Description": selected_delays,
+}
 
-# top10 fastest boroughs
-
-fast_palette = sns.color_palette("YlGn_r", len(fastest_sorted))
-
-sns.barplot(
-    data=fastest_sorted,
-    y="IncGeo_BoroughName",
-    x="MedianResponseMinutes",
-    order=fastest_sorted["IncGeo_BoroughName"],
-    palette=fast_palette,
-    ax=ax1
-)
-    
-# Reference line
-ax1.axvline(
-    x=6,
-    color="black",
-    linestyle="--",
-    linewidth=2
-)
+selections.update({column: values for column, values in dimension_filters.items() if values})
 
-# Text left of the reference line
-ax1.text(
-    5.95,                                
-    -0.5,                                 
-    "6-minute response target",
-    fontsize=10,
-    ha="right",                           
-)
+# Rows of the date window, intersected with the selections' bitmaps
+lo, hi, filtered_df = sections.select_rows(df, bitmap_index, date_window, selections)
 
-ax1.set_title("Top 10 Fastest Boroughs (Median Response Time)",weight="bold")
+if selections:
+    # The daily pre-aggregates do not cover dimension filters
+    date_window = None
 
-ax1.set_xlabel("")
-ax1.set_ylabel("")
+if filtered_df.empty:
+    st.warning("No data available for selected filters.")
+    st.stop()
 
-# top10 slowest boroughs
+if any(dimension_filters.values()):
+    data_shown += f" | {sum(1 for values in dimension_filters.values() if values)} additional filter(s)"
 
-slow_palette = sns.color_palette("YlOrRd", len(slowest_sorted))
+st.caption(f"Data shown: {data_shown}")
 
-sns.barplot(
-    data=slowest_sorted,
-    y="IncGeo_BoroughName",
-    x="MedianResponseMinutes",
-    order=slowest_sorted["IncGeo_BoroughName"],
-    palette=slow_palette,
-    ax=ax2
+# Identity of the filtered rows (and engine), keying the shared computations
+filter_state = (
+    selected_backend,
+    int(lo),
+    int(hi),
+    tuple(sorted((column, tuple(values)) for column, values in selections.items())),
 )
 
-ax2.axvline(6, color="black", linestyle="--", linewidth=2)
-
-ax2.set_title("Top 10 Slowest Boroughs (Median Response Time)",weight="bold")
+def compute_section(name):
+    # Date windows take the volume treemap from its pre-aggregates
+    if name == "volume_treemap" and date_window is not None:
+        return sections.volume_treemap_range(borough_group_daily, *date_window)
+    return sections.compute_section(name, filtered_df, backend)
 
-ax2.set_xlabel("Median Response Time (minutes)")
-ax2.set_ylabel("")
-
-sns.despine()
-fig.tight_layout()
-
-st.pyplot(fig)
+def shared_section(name):
+    # Future of a section computation, shared with every other session and
+    # served from the disk cache when any process computed it before
+    return computations.submit(
+        (filter_state, name), session_id,
+        disk_cache().get_or_compute, (dataset_hash(), filter_state, name),
+        compute_section, name
+    )
 
+def section_chart(name, section):
+    show_chart(name, section, cache_key=(dataset_hash(), filter_state, name))
 
+# KPI header placeholder, filled as soon as the KPIs are computed
+kpi_header = st.empty()
 
 #######################################################################################
 #######################################################################################
 
-st.subheader("First Pump Response Performance Against the 6-Minute Target")
-
-# Calculate compliance
-compliance_by_borough = (
-    filtered_df
-    .groupby("IncGeo_BoroughName")["FirstPump_Within_6min"]
-    .mean()
-    .mul(100)
-    .reset_index(name="CompliancePercent")
-    .sort_values("CompliancePercent")
-)
-
-# Select top10 highest and top10 lowest compliance
-top10_compliance = compliance_by_borough.tail(10)
-bottom10_compliance = compliance_by_borough.head(10)
-
-# Correct ordering:
-# Highest compliance at TOP
-top10_sorted = top10_compliance.sort_values(
-    "CompliancePercent",
-    ascending=False
-)
-
-# Lowest compliance:
-# "less bad" at top, worst at bottom
-bottom10_sorted = bottom10_compliance.sort_values(
-    "CompliancePercent",
-    ascending=False
-)
-
-# Plot
-
-sns.set_theme(style="white")
-
-fig, (ax1, ax2) = plt.subplots(
-    2, 1,
-    figsize=(12, 12),
-    sharex=True
-)
-
-
-# Highest Compliance
-
-high_palette = sns.color_palette("YlGn_r", len(top10_sorted))
-
-sns.barplot(
-    data=top10_sorted,
-    y="IncGeo_BoroughName",
-    x="CompliancePercent",
-    order=top10_sorted["IncGeo_BoroughName"],
-    palette=high_palette,
-    ax=ax1
-)
-
-ax1.set_title("Top 10 Boroughs — Highest Compliance (%)", weight="bold")
-ax1.set_xlabel("")
-ax1.set_ylabel("")
+# KPI Calculations
+# Contiguous date windows are served from the daily pre-aggregates; fall back
+# to the filtered rows when the selection is not a window or a percentile
+# lies beyond the attendance histogram (see sections.selection_kpis).
+with kpi_header.container(), st.spinner("Computing KPIs…"):
+
+    kpis = sections.selection_kpis(
+        daily_aggregates, date_window,
+        lambda: computations.submit(
+            (filter_state, "kpis"), session_id,
+            disk_cache().get_or_compute, (dataset_hash(), filter_state, "kpis"),
+            agg.compute_kpis, filtered_df, backend
+        ).result()
+    )
 
-# Lowest Compliance
+#######################################################################################
+#######################################################################################
 
-low_palette = sns.color_palette("YlOrRd", len(bottom10_sorted))
+# Display KPIs
+with kpi_header.container():
+    render_kpis(kpis)
+
+if first_paint is None:
+    first_paint = time.perf_counter() - script_started
+
+cpu_report = report_timings()
+
+# Progressive rendering: once the KPIs are on screen, every section is
+# computed on the worker pool and each chart is drawn as soon as its own data
+# is ready, in page order. Without it, each section is computed inline in
+# the script thread when the page reaches it. Both go through the shared
+# computations (a session computing a section inline is joined, not
+# repeated, by concurrent sessions) and the disk cache.
+def demand_forecast_data(store):
+    return disk_cache().get_or_compute(
+        (dataset_hash(), filter_state, "demand_forecast"),
+        compute_forecast, filtered_df, store, filter_state[3]
+    )
 
-sns.barplot(
-    data=bottom10_sorted,
-    y="IncGeo_BoroughName",
-    x="CompliancePercent",
-    order=bottom10_sorted["IncGeo_BoroughName"],
-    palette=low_palette,
-    ax=ax2
-)
+forecastable = forecast.forecastable(filtered_df, selections)
 
-ax2.set_title("Top 10 Boroughs — Lowest Compliance (%)", weight="bold")
-ax2.set_xlabel("Compliance Rate (%)")
-ax2.set_ylabel("")
+if progressive:
+    pending = {name: shared_section(name) for name in sections.SECTIONS}
 
-ax2.set_xlim(0, 100)
+    if forecastable:
+        demand_forecast_future = computations.submit(
+            (filter_state, "demand_forecast"), session_id,
+            demand_forecast_data, forecast_statistics()
+        )
 
-sns.despine()
-fig.tight_layout()
+def section_data(name):
+    with st.spinner(f"Computing {sections.SECTIONS[name][0].lower()}…"):
+        if progressive:
+            return pending[name].result()
 
-st.pyplot(fig)
+        return computations.compute(
+            (filter_state, name), session_id,
+            disk_cache().get_or_compute, (dataset_hash(), filter_state, name),
+            compute_section, name
+        )
 
 #######################################################################################
 #######################################################################################
 
-st.subheader("Response Time Bands Distribution")
+st.subheader("Monthly Incident Trends by Incident Type")
 
-# Create response time in minutes
-filtered_df["ResponseMinutes"] = (
-    filtered_df["FirstPumpArriving_AttendanceTime"] / 60
-)
+monthly_trends = section_data("monthly_trends")
 
-# Extreme delay KPI (GLOBAL)
-extreme_delay_rate = (
-    (filtered_df["ResponseMinutes"] > 10).mean() * 100
-)
+section_chart("monthly_trends_chart", monthly_trends)
 
-# Define bands
-bins = [0, 6, 8, 10, float("inf")]
-labels = ["≤ 6 min", "6–8 min", "8–10 min", "> 10 min"]
+#######################################################################################
+#######################################################################################
 
-filtered_df["ResponseBand"] = pd.cut(
-    filtered_df["ResponseMinutes"],
-    bins=bins,
-    labels=labels,
-    right=True
-)
+st.subheader("Daily and Hourly Incident Heatmap")
 
-# Count incidents per band & type
-band_counts = (
-    filtered_df
-    .groupby(["IncidentGroup", "ResponseBand"])
-    .size()
-    .reset_index(name="Count")
-)
+hourly_heatmap = section_data("hourly_heatmap")
 
-# Calculate percentage within each IncidentGroup
-band_counts["Percent"] = (
-    band_counts.groupby("IncidentGroup")["Count"]
-    .transform(lambda x: 100 * x / x.sum())
-)
+section_chart("hourly_heatmap_chart", hourly_heatmap)
 
-# Pivot for stacked bar
-band_pivot = band_counts.pivot(
-    index="IncidentGroup",
-    columns="ResponseBand",
-    values="Percent"
-).fillna(0)
+#######################################################################################
+#######################################################################################
 
-band_pivot = band_pivot[labels]
+st.subheader(forecast.TITLE)
 
-# Plot
-fig, ax = plt.subplots(figsize=(12, 6))
+if "Month" in selections:
+    st.info("Select a year or date range to forecast demand.")
 
-colors = ["#2ca02c", "#ffdd57", "#ff8c42", "#d62728"]
+elif not forecastable:
+    st.info(f"Select at least {forecast.MIN_PROFILE_DAYS} days to forecast demand.")
 
-left = None
+else:
+    # Cached per filter state; computed on the worker pool while the charts
+    # above are drawn
+    with st.spinner("Fitting demand forecast…"):
+        if progressive:
+            demand_forecast = demand_forecast_future.result()
+        else:
+            demand_forecast = computations.compute(
+                (filter_state, "demand_forecast"), session_id,
+                demand_forecast_data, forecast_statistics()
+            )
+
+    section_chart("demand_forecast_chart", demand_forecast)
+
+    if demand_forecast["trend"]:
+        model = (
+            "hour × weekday profile, month of year and trend "
+            f"({demand_forecast['trend_per_year']:+.1f} incidents per day per year)"
+        )
+    elif demand_forecast["seasonal"]:
+        model = "hour × weekday profile and month of year (two years of data add a trend)"
+    else:
+        model = "hour × weekday profile (a year of data adds month of year)"
 
-for i, band in enumerate(labels):
-    ax.barh(
-        band_pivot.index,
-        band_pivot[band],
-        left=left,
-        color=colors[i],
-        label=band
+    st.caption(
+        f"{demand_forecast['start']} – {demand_forecast['end']}. Least squares {model}, "
+        f"fitted on {demand_forecast['fitted_days']:,} days of distinct incidents per hour; "
+        f"RMSE {demand_forecast['rmse']:.2f} incidents per hour."
     )
-    if left is None:
-        left = band_pivot[band]
-    else:
-        left += band_pivot[band]
-
-ax.set_xlim(0, 100)
-ax.set_xlabel("Percentage of Incidents (%)")
-ax.set_title("Response Time Distribution by Incident Type", weight="bold")
-
-ax.legend(
-    title="Response Band",
-    loc="upper center",
-    bbox_to_anchor=(0.5, -0.12),
-    ncol=4,
-    frameon=False
-)
 
-sns.despine()
-fig.tight_layout()
-st.pyplot(fig)
+#######################################################################################
+#######################################################################################
 
+st.subheader("Monthly Response Performance by Incident Type")
 
-extreme_delay_rate = (
-    filtered_df["ResponseMinutes"] > 10
-).mean() * 100
+monthly_response = section_data("monthly_response")
 
-st.markdown(f"""
-**Extreme Delays**
-            : **Incidents exceeding 10 minutes:** {extreme_delay_rate:.2f}%"
-""")
+section_chart("monthly_response_chart", monthly_response)
 
 #######################################################################################
 #######################################################################################
 
+st.subheader("Response Performance by Borough")
 
+borough_response = section_data("borough_response")
+median_response_by_borough = borough_response["median_response_by_borough"]
 
-
-
+section_chart("borough_response_chart", borough_response)
 
 #######################################################################################
 #######################################################################################
 
-st.subheader("Distribution of First Pump Attendance Time")
-
-response_minutes = filtered_df["FirstPumpArriving_AttendanceTime"] / 60
-
-median = response_minutes.median()
-mean = response_minutes.mean()
-p90 = response_minutes.quantile(0.90)
-
-fig, ax = plt.subplots(figsize=(10, 6))
+st.subheader("First Pump Response Performance Against the 6-Minute Target")
 
-sns.histplot(
-    response_minutes,
-    bins=60,
-    kde=True,
-    ax=ax
-)
+borough_compliance = section_data("borough_compliance")
+compliance_by_borough = borough_compliance["compliance_by_borough"]
 
-# Reference lines
-ax.axvline(6, color="red", linestyle="--", linewidth=2, label="6-min target")
-ax.axvline(median, color="black", linewidth=2, label=f"Median ({median:.2f})")
-ax.axvline(mean, color="blue", linestyle="--", label=f"Mean ({mean:.2f})")
-ax.axvline(p90, color="purple", linestyle=":", label=f"P90 ({p90:.2f})")
+section_chart("borough_compliance_chart", borough_compliance)
 
-ax.set_title("Distribution of First Pump Attendance Time", weight="bold")
-ax.set_xlabel("Attendance Time (minutes)")
-ax.set_ylabel("Frequency")
+#######################################################################################
+#######################################################################################
 
-ax.legend(frameon=False)
+st.subheader("Response Time Bands Distribution")
 
-sns.despine()
-fig.tight_layout()
+response_bands = section_data("response_bands")
+band_pivot = response_bands["band_pivot"]
 
-st.pyplot(fig)
+section_chart("response_bands_chart", response_bands)
 
 st.markdown(f"""
-- Median response time: **{median:.2f} minutes**
-- 90% of incidents are handled within **{p90:.2f} minutes**
-- The gap between mean and median indicates a right-skewed distribution driven by extreme delays.
+**Extreme Delays**
+            : **Incidents exceeding 10 minutes:** {response_bands["extreme_delay_rate"]:.2f}%"
 """)
 
 #######################################################################################
 #######################################################################################
 
-bins = [0, 4, 6, 8, 20]
-labels = ["<4 min", "4–6 min", "6–8 min", ">8 min"]
-
-band_distribution = (
-    pd.cut(response_minutes, bins=bins, labels=labels)
-    .value_counts(normalize=True)
-    .sort_index()
-    .mul(100)
-    .round(1)
-)
-
-fig, ax = plt.subplots(figsize=(8, 5))
-
-sns.barplot(
-    x=band_distribution.index,
-    y=band_distribution.values,
-    palette="YlGnBu",
-    ax=ax
-)
+st.subheader("Distribution of First Pump Attendance Time")
 
-ax.set_title("Response Time Distribution Bands (%)", weight="bold")
-ax.set_ylabel("Percentage of Incidents")
-ax.set_xlabel("Response Time Band")
+attendance_distribution = section_data("attendance_distribution")
 
-sns.despine()
-fig.tight_layout()
+section_chart("attendance_histogram_chart", attendance_distribution)
 
-st.pyplot(fig)
+st.markdown(f"""
+- Median response time: **{attendance_distribution["median"]:.2f} minutes**
+- 90% of incidents are handled within **{attendance_distribution["p90"]:.2f} minutes**
+- The gap between mean and median indicates a right-skewed distribution driven by extreme delays.
+""")
 
-extreme_delay_share = (
-    (response_minutes > 10).mean() * 100
-)
+section_chart("attendance_bands_chart", attendance_distribution)
 
 st.markdown(f"""
 **Extreme Delays**
-            : **Incidents exceeding 10 minutes: {extreme_delay_share:.2f}%**
+            : **Incidents exceeding 10 minutes: {attendance_distribution["extreme_delay_share"]:.2f}%**
 """)
 
 #######################################################################################
@@ -786,214 +731,137 @@ st.markdown(f"""
 
 st.subheader("Response Time Distribution by Incident Type")
 
-incident_types = ["Fire", "Special Service", "False Alarm"]
-
-fig, axes = plt.subplots(
-    3, 1,
-    figsize=(10, 14),   # deutlich höher
-    sharex=True
-)
-
-for ax, incident in zip(axes, incident_types):
-
-    subset = filtered_df[
-        filtered_df["IncidentGroup"] == incident
-    ]
-
-    response_minutes = subset["FirstPumpArriving_AttendanceTime"] / 60
-
-    sns.histplot(
-        response_minutes,
-        bins=50,
-        kde=True,
-        ax=ax
-    )
-
-    ax.axvline(6, color="red", linestyle="--", linewidth=2)
+distribution_by_type = section_data("distribution_by_type")
 
-    ax.set_title(incident, weight="bold")
-    ax.set_ylabel("Frequency")
-
-axes[-1].set_xlabel("Attendance Time (minutes)")
-
-sns.despine()
-fig.tight_layout()
-
-st.pyplot(fig)
+section_chart("distribution_by_type_chart", distribution_by_type)
 
 #######################################################################################
 #######################################################################################
 
 st.subheader("Response Time Decomposition: Turnout vs Travel")
 
-# Calculate average turnout & travel per Incident Type
-decomposition = (
-    filtered_df
-    .groupby("IncidentGroup")[["TurnoutTimeSeconds", "TravelTimeSeconds"]]
-    .mean()
-    .div(60)  # convert to minutes
-    .reset_index()
-)
-
-# Calculate total
-decomposition["TotalMinutes"] = (
-    decomposition["TurnoutTimeSeconds"] +
-    decomposition["TravelTimeSeconds"]
-)
-
-# Calculate percentage contribution
-decomposition["TurnoutPercent"] = (
-    decomposition["TurnoutTimeSeconds"] /
-    decomposition["TotalMinutes"] * 100
-)
-
-decomposition["TravelPercent"] = (
-    decomposition["TravelTimeSeconds"] /
-    decomposition["TotalMinutes"] * 100
-)
-
-order = ["Fire", "Special Service", "False Alarm"]
-decomposition = decomposition.set_index("IncidentGroup").loc[order].reset_index()
-
-sns.set_theme(style="white")
+# Average turnout & travel per Incident Type (minutes) and their percentage contribution
+decomposition_section = section_data("decomposition")
+decomposition = decomposition_section["decomposition"]
 
-# Prepare stacked bar
-fig, ax = plt.subplots(figsize=(10, 6))
+section_chart("decomposition_chart", decomposition_section)
 
-colorblind = sns.color_palette("colorblind")
-
-# Turnout
-ax.barh(
-    decomposition["IncidentGroup"],
-    decomposition["TurnoutPercent"],
-    color=colorblind[0],
-    label="Turnout Time"
-)
-
-# Travel
-ax.barh(
-    decomposition["IncidentGroup"],
-    decomposition["TravelPercent"],
-    left=decomposition["TurnoutPercent"],
-    color=colorblind[1],
-    label="Travel Time"
-)
+# Turnout & travel percentiles (P50 / P90 / P95) per incident type and borough
+percentile_decomposition = section_data("percentile_decomposition")
 
-ax.set_xlim(0, 100)
-ax.set_xlabel("Percentage of Total Response Time (%)")
-ax.set_title("Turnout vs Travel Contribution by Incident Type", weight="bold")
+section_chart("percentile_decomposition_chart", percentile_decomposition)
 
-ax.legend(
-    title="Component",
-    loc="upper center",
-    bbox_to_anchor=(0.5, -0.12),
-    ncol=2,
-    frameon=False
-)
+st.markdown("""
+Turnout and travel time at each percentile, side by side. Each component's percentile
+is taken on its own, so the two bars do not add up to a response time percentile: they
+show how slow the slowest turnouts and the slowest journeys are, which the means above hide.
+""")
 
-sns.despine()
-fig.tight_layout()
-st.pyplot(fig)
+with st.expander("Percentiles by borough"):
+    st.dataframe(
+        percentile_decomposition["by_borough"].pivot(
+            index="IncGeo_BoroughName", columns="Component", values=["P50", "P90", "P95"]
+        ).round(2),
+        width="stretch"
+    )
 
 #######################################################################################
 #######################################################################################
 
 st.subheader("Extreme Delays (>10 minutes): Pareto Analysis")
 
-filtered_df["ResponseMinutes"] = (
-    filtered_df["FirstPumpArriving_AttendanceTime"] / 60
-)
-
-extreme_df = filtered_df[filtered_df["ResponseMinutes"] > 10]
-
-delay_counts_extreme = (
-    extreme_df
-    .groupby("DelayCode_Description")
-    .size()
-    .reset_index(name="IncidentCount")
-    .sort_values("IncidentCount", ascending=False)
-)
+# Delay code counts with share and cumulative share of extreme delays
+extreme_delays = section_data("extreme_delays")
+pareto_df = extreme_delays["pareto_df"]
 
-if delay_counts_extreme.empty:
+# Only the Pareto chart is skipped without extreme delays: the export, data
+# quality and tab panels below still render
+if extreme_delays["delay_counts_extreme"].empty:
     st.warning("No extreme delays found for selected filters.")
-    st.stop()
 
-total_extreme = delay_counts_extreme["IncidentCount"].sum()
-
-delay_counts_extreme["Percent"] = (
-    delay_counts_extreme["IncidentCount"] / total_extreme * 100
-)
+else:
+    section_chart("extreme_delays_chart", extreme_delays)
 
-delay_counts_extreme["CumulativePercent"] = (
-    delay_counts_extreme["Percent"].cumsum()
-)
+    st.markdown(f"""
+Extreme Delays: 
+  **Top 3 delay codes explain {extreme_delays["top3_share"]:.1f}% of extreme response delays (>10 minutes).**
+""")
 
-pareto_df = delay_counts_extreme.head(10).copy()
 
-pareto_df["ShortLabel"] = (
-    pareto_df["DelayCode_Description"]
-    .str.slice(0, 35)
-)
-
-sns.set_theme(style="white")
+#######################################################################################
+#######################################################################################
 
-fig, ax1 = plt.subplots(figsize=(16, 8))
+# Export the numbers behind the charts. Files are generated only when a
+# download is requested (deferred callables), written chunk by chunk.
 
-bars = sns.barplot(
-    data=pareto_df,
-    x="ShortLabel",
-    y="Percent",
-    palette="Reds_r",
-    ax=ax1
-)
+export_tables = {
+    "kpis": export.kpi_table(kpis),
+    "band_pivot": band_pivot,
+    "decomposition": decomposition,
+    "percentile_decomposition_by_group": percentile_decomposition["by_group"],
+    "percentile_decomposition_by_borough": percentile_decomposition["by_borough"],
+    "median_response_by_borough": median_response_by_borough,
+    "compliance_by_borough": compliance_by_borough,
+    "pareto_df": pareto_df,
+}
 
-ax1.set_ylabel("Share of Extreme Delays (%)", fontsize=13)
-ax1.set_xlabel("")
-ax1.set_title(
-    "Pareto Analysis of Extreme Delay Drivers (>10 minutes)",
-    fontsize=16,
-    weight="bold"
-)
+with st.sidebar.expander("Export Data"):
 
-ax1.tick_params(axis='x', labelsize=11)
-ax1.tick_params(axis='y', labelsize=11)
+    export_format = st.radio(
+        "Format",
+        options=list(export.FORMATS),
+        horizontal=True
+    )
 
-plt.xticks(rotation=45, ha="right")
+    export_extension = export.FORMATS[export_format]["extension"]
 
-# Add percentage labels on bars
-for container in ax1.containers:
-    ax1.bar_label(container, fmt="%.1f%%", padding=3, fontsize=10)
+    st.download_button(
+        "Download aggregate tables (.zip)",
+        data=lambda: export.export_tables(export_tables, export_format),
+        file_name=f"lfb_aggregates_{export_extension}.zip",
+        mime="application/zip",
+        on_click="ignore"
+    )
 
-# Cumulative line
-ax2 = ax1.twinx()
+    st.download_button(
+        f"Download filtered rows (.{export_extension})",
+        data=lambda: export.export_frame(filtered_df, export_format),
+        file_name=f"lfb_filtered_rows.{export_extension}",
+        mime=export.FORMATS[export_format]["mime"],
+        on_click="ignore"
+    )
 
-ax2.plot(
-    pareto_df["ShortLabel"],
-    pareto_df["CumulativePercent"],
-    color="black",
-    marker="o",
-    linewidth=2
-)
+#######################################################################################
+#######################################################################################
 
-ax2.set_ylabel("Cumulative Share (%)", fontsize=13)
-ax2.set_ylim(0, 100)
-ax2.tick_params(axis='y', labelsize=11)
+# Data quality of the loaded dataset: rows quarantined by the validation stage
+quality_report = load_quality_report()
+quality_summary = quality_report["summary"]
 
-# 80% reference
-ax2.axhline(80, linestyle="--", color="gray", alpha=0.6)
+with st.sidebar.expander("Data Quality"):
 
-sns.despine()
-fig.tight_layout()
+    st.caption(
+        f"{quality_summary['valid_rows']:,} of {quality_summary['rows']:,} rows passed validation "
+        f"({quality_summary['quarantined_rows']:,} quarantined, "
+        f"checked in {quality_summary['seconds']:.2f}s)"
+    )
 
-st.pyplot(fig)
+    for warning in quality_summary["warnings"]:
+        st.warning(warning)
 
-# Calculate Top 3 cumulative share
-top3_share = delay_counts_extreme.head(3)["Percent"].sum()
+    if quality_summary["checks"]:
+        st.dataframe(
+            pd.Series(quality_summary["checks"], name="Rows").rename_axis("Check"),
+            width="stretch"
+        )
 
-st.markdown(f"""
-Extreme Delays: 
-  **Top 3 delay codes explain {top3_share:.1f}% of extreme response delays (>10 minutes).**
-""")
+        st.download_button(
+            "Download quarantined rows (.csv)",
+            data=lambda: export.export_frame(quality_report["quarantine"], "CSV"),
+            file_name="lfb_quarantined_rows.csv",
+            mime="text/csv",
+            on_click="ignore"
+        )
 
 
 
@@ -1033,15 +901,8 @@ with tab1:
 
     st.subheader("Key Performance Indicators")
 
-    col1, col2, col3 = st.columns(3)
-    col1.metric("Total Incidents", f"{total_incidents:,}")
-    col2.metric("Median Response Time (min)", f"{median_response:.2f}")
-    col3.metric("Response within 6 min (%)", f"{response_within_6min:.1f}")
-
-    col4, col5, col6 = st.columns(3)
-    col4.metric("False Alarm Rate (%)", f"{false_alarm_rate:.1f}")
-    col5.metric("Fire Rate (%)", f"{fire_rate:.1f}")
-    col6.metric("Special Service Rate (%)", f"{special_service_rate:.1f}")
+    # Same KPI values as the header, not recomputed
+    render_demand_kpis(kpis)
 
     st.subheader("Monthly Incident Trends by Incident Type")
     # <- hier kommt dein kompletter Monthly Plot Code rein
@@ -1053,19 +914,91 @@ with tab2:
 
     st.subheader("Operational KPIs")
 
-    col7, col8, col9, col10 = st.columns(4)
-    col7.metric("90th Percentile Response Time (min)", f"{p90_response:.2f}")
-    col8.metric("Average Response Time (min)", f"{avg_response:.2f}")
-    col9.metric("Second Pump Deployment Rate (%)", f"{second_pump_rate:.1f}")
-    col10.metric("Average Pumps Attending", f"{avg_pumps:.2f}")
+    render_operational_kpis(kpis)
 
     st.subheader("Response Performance Over Time")
 
+    st.subheader("Anomalous Days")
+
+    # Days of the selected period whose median attendance or extreme delay
+    # rate deviates sharply from the trailing 28-day baseline of their area.
+    # Scores cover all incidents of an area: the date, month and borough
+    # selection applies, the other dimension filters cannot.
+    other_filters = [
+        label for column, label in [
+            ("IncidentGroup", "incident group"),
+            ("HourOfCall", "hour of call"),
+            ("DelayCode_Description", "delay code"),
+        ]
+        if dimension_filters[column]
+    ]
+
+    if other_filters:
+        st.info(
+            f"Anomalous days are scored over all incidents of London and each borough, "
+            f"so they cannot follow the {' and '.join(other_filters)} filter. Clear it "
+            f"to list the anomalous days of the selected period and boroughs."
+        )
+
+    else:
+        # Calendar days of the selection: the date window, restricted to the
+        # selected month for a month across all years
+        selected_days = pd.date_range(df["CallDate"].iloc[lo], df["CallDate"].iloc[hi - 1], freq="D")
+        if "Month" in selections:
+            selected_days = selected_days[selected_days.month.isin(selections["Month"])]
+
+        anomalous_days = anomalies.anomalies(
+            load_anomalies(),
+            selected_days[0],
+            selected_days[-1],
+            selected_boroughs,
+            days=selected_days
+        )
+
+        if anomalous_days.empty:
+            st.info("No anomalous days in the selected period.")
+        else:
+            st.caption(
+                f"{len(anomalous_days)} day(s) of the selected period and boroughs, over all "
+                f"incidents, with a robust z-score of at least {anomalies.THRESHOLD} against "
+                f"the median and MAD of the previous {anomalies.BASELINE_DAYS} days (extreme "
+                f"delay rates against at least the binomial spread of the day's incidents). "
+                f"Red: worse than baseline, green: better."
+            )
+
+            st.dataframe(
+                anomalous_days.style
+                .format({"Value": "{:.2f}", "Baseline": "{:.2f}", "Score": "{:+.1f}"})
+                .map(
+                    lambda score: f"background-color: {'#f8d7da' if score > 0 else '#d4edda'}",
+                    subset=["Score"]
+                ),
+                width="stretch",
+                hide_index=True
+            )
+
 with tab3:
 
     st.subheader("Response Performance by Borough")
     st.subheader("First Pump Response Performance Against the 6-Minute Target")
-   
+
+    st.subheader("Incident Volume by Borough and Incident Type")
+
+    # Distinct incidents and median response per (borough, incident type)
+    # cell, counted and sketched in one pass; warm reruns reuse the cached
+    # result and image
+    volume_treemap = section_data("volume_treemap")
+
+    if volume_treemap["volume"].empty:
+        st.info("No incidents for selected filters.")
+    else:
+        section_chart("volume_treemap_chart", volume_treemap)
+        st.caption(
+            "Area: distinct incidents. Colour: median first pump attendance time "
+            "(green faster, red slower)."
+        )
+
 #######################################################################################
 #######################################################################################
 
+report_cpu(cpu_report)
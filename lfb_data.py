@@ -0,0 +1,137 @@
+
+import json
+import os
+import tempfile
+
+import pandas as pd
+
+import lfb_aggregations as agg
+import lfb_quality as quality
+import lfb_timeindex as timeindex
+
+#######################################################################################
+#######################################################################################
+
+# Loading and feature engineering of the incident dataset, shared by the
+# dashboard (which caches the result per process) and the offline report
+# generator.
+#
+# Raw rows first go through the schema and data-quality checks of
+# lfb_quality.py; rows failing them are quarantined, not prepared.
+#
+# Next to the dataset lives a small JSON summary (date range, years and the
+# KPIs of the unfiltered view), tied to the dataset file by size and mtime.
+# The dashboard paints its KPI header from it while the full dataset loads.
+# It also carries the quality summary of the last load.
+
+DATA_PATH = "lfb_streamlit.parquet"
+SUMMARY_PATH = "lfb_summary.json"
+
+# Columns with a per-value bitmap index (sidebar dimension filters)
+BITMAP_COLUMNS = ["Month", "IncidentGroup", "IncGeo_BoroughName", "HourOfCall", "DelayCode_Description"]
+
+#######################################################################################
+#######################################################################################
+
+
+def load_data(path=DATA_PATH):
+    return pd.read_parquet(path)
+
+
+def add_features(df):
+    # Convert to datetime 
+    df["CallDate"] = pd.to_datetime(df["CallDate"])
+
+    # Create time features (needed for Daily and Hourly Incident Heatmap)
+    df["HourOfCall"] = pd.to_datetime(df["TimeOfCall"], format=quality.TIME_FORMAT).dt.hour
+    df["CallWeekday"] = pd.to_datetime(df["CallDate"]).dt.day_name()
+
+    # Extract year and month
+    df["Year"] = df["CallDate"].dt.year
+    df["Month"] = df["CallDate"].dt.month
+    df["MonthName"] = df["CallDate"].dt.month_name()
+    df["CallMonth"] = df["CallDate"].dt.month
+
+    # Identify incidents where the first pump arrived within the 6-minute response target
+    df["FirstPump_Within_6min"] = df["FirstPumpArriving_AttendanceTime"] <= 360
+
+    # Sorted by CallDate so any date window is a contiguous slice
+    return timeindex.sort_by_call_date(df)
+
+
+def prepare_data_with_quality(df):
+    # Quarantine invalid rows (and convert columns to their schema type)
+    df, report = quality.validate(df)
+    return add_features(df), report
+
+
+def prepare_data(df):
+    return prepare_data_with_quality(df)[0]
+
+
+def load_prepared_data(path=DATA_PATH):
+    return prepare_data(load_data(path))
+
+
+def load_prepared_data_with_quality(path=DATA_PATH):
+    return prepare_data_with_quality(load_data(path))
+
+#######################################################################################
+#######################################################################################
+
+
+def dataset_signature(path=DATA_PATH):
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def build_summary(df, path=DATA_PATH, quality_summary=None):
+    return {
+        "signature": dataset_signature(path),
+        "first_date": df["CallDate"].iloc[0].strftime("%Y-%m-%d"),
+        "last_date": df["CallDate"].iloc[-1].strftime("%Y-%m-%d"),
+        "years": sorted(int(year) for year in df["Year"].unique()),
+        "kpis": {kpi: float(value) for kpi, value in agg.compute_kpis(df).items()},
+        "quality": quality_summary,
+    }
+
+
+def read_summary(summary_path=SUMMARY_PATH, path=DATA_PATH):
+    # None when missing, unreadable or written for a different dataset file
+    try:
+        with open(summary_path, encoding="utf-8") as handle:
+            summary = json.load(handle)
+        if summary["signature"] != dataset_signature(path):
+            return None
+    except (OSError, ValueError, KeyError):
+        return None
+
+    summary["kpis"]["total_incidents"] = int(summary["kpis"]["total_incidents"])
+    return summary
+
+
+def write_summary(summary, summary_path=SUMMARY_PATH):
+    # Atomic replace, so concurrent readers never see a partial file
+    directory = os.path.dirname(os.path.abspath(summary_path))
+    handle, tmp_path = tempfile.mkstemp(dir=directory, suffix=".tmp")
+    try:
+        with os.fdopen(handle, "w", encoding="utf-8") as tmp:
+            json.dump(summary, tmp)
+        os.replace(tmp_path, summary_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+def load_prepared_data_with_summary(path=DATA_PATH, summary_path=SUMMARY_PATH):
+    # Background loader of the dashboard: refreshes a stale summary as a side
+    # effect. Returns the prepared frame and the quality report.
+    df, report = load_prepared_data_with_quality(path)
+
+    if read_summary(summary_path, path) is None:
+        try:
+            write_summary(build_summary(df, path, report["summary"]), summary_path)
+        except OSError:
+            pass  # read-only deployments simply start without a summary
+
+    return df, report
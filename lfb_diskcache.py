@@ -0,0 +1,236 @@
+
+import glob
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+
+#######################################################################################
+#######################################################################################
+
+# Persistent cache of section results and rendered chart images.
+#
+# Entries live under CACHE_DIR, one directory per key, where a key is the
+# dataset content hash plus the filter state and section (or chart). A
+# directory holds a manifest.json describing the value and one Parquet file
+# per DataFrame / Series in it (chart images are stored as PNG bytes).
+#
+# Writers build an entry in a temporary directory and rename it into place,
+# so readers in any process see a complete entry or none. When the cache
+# grows beyond its size limit, the least recently used entries are removed
+# (renamed away first, then deleted). A damaged or vanished entry is a miss.
+#
+# Results depend on the code as well as the data (schema checks, feature
+# engineering, sections, charts), so every key also carries CODE_HASH, a hash
+# of the lfb_*.py sources and the pandas version: any code change starts a
+# fresh set of entries, and the old ones age out through eviction.
+
+CACHE_DIR = os.environ.get("LFB_CACHE_DIR", ".lfb_cache")
+MAX_BYTES = int(os.environ.get("LFB_CACHE_MAX_MB", "512")) * 1024 * 1024
+
+# Leftovers of interrupted writers older than this are removed on eviction
+STALE_TMP_SECONDS = 3600
+
+MANIFEST = "manifest.json"
+
+#######################################################################################
+#######################################################################################
+
+
+def file_hash(path, chunk_size=1 << 20):
+    # Content hash of the dataset file: restarts and copies of the same data
+    # share cache entries, any change to the data gives new keys
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as handle:
+        for chunk in iter(lambda: handle.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def code_hash(directory=os.path.dirname(os.path.abspath(__file__))):
+    # Hash of the dashboard sources (names and contents) and the pandas version
+    digest = hashlib.blake2b(pd.__version__.encode("utf-8"), digest_size=16)
+    for path in sorted(glob.glob(os.path.join(directory, "lfb_*.py"))):
+        digest.update(os.path.basename(path).encode("utf-8"))
+        with open(path, "rb") as handle:
+            digest.update(handle.read())
+    return digest.hexdigest()
+
+
+CODE_HASH = code_hash()
+
+
+def _encode(value, directory, files):
+    # Manifest spec of value; frames, series and bytes go to their own files
+    if isinstance(value, pd.DataFrame):
+        spec = {"kind": "frame"}
+
+        # Parquet keeps string column labels only; other column indexes
+        # (e.g. the categorical response bands) are stored as a series
+        columns = value.columns
+        if isinstance(columns, pd.CategoricalIndex) or not all(isinstance(label, str) for label in columns):
+            spec["columns"] = _encode(pd.Series(columns, name=columns.name), directory, files)
+            value = value.set_axis([str(position) for position in range(len(columns))], axis=1)
+
+        name = spec["file"] = f"{len(files)}.parquet"
+        value.to_parquet(os.path.join(directory, name))
+        files.append(name)
+        return spec
+
+    if isinstance(value, pd.Series):
+        name = f"{len(files)}.parquet"
+        value.to_frame("__series__").to_parquet(os.path.join(directory, name))
+        files.append(name)
+        return {"kind": "series", "file": name, "name": _encode(value.name, directory, files)}
+
+    if isinstance(value, bytes):
+        name = f"{len(files)}.bin"
+        with open(os.path.join(directory, name), "wb") as handle:
+            handle.write(value)
+        files.append(name)
+        return {"kind": "bytes", "file": name}
+
+    if isinstance(value, dict) and all(isinstance(key, str) for key in value):
+        return {"kind": "dict", "items": [[key, _encode(item, directory, files)] for key, item in value.items()]}
+
+    if isinstance(value, np.generic):
+        value = value.item()
+
+    if value is None or isinstance(value, (bool, int, float, str)):
+        return {"kind": "value", "value": value}
+
+    raise TypeError(f"Cannot cache values of type {type(value).__name__}")
+
+
+def _decode(spec, directory):
+    kind = spec["kind"]
+
+    if kind == "frame":
+        frame = pd.read_parquet(os.path.join(directory, spec["file"]))
+        if "columns" in spec:
+            columns = _decode(spec["columns"], directory)
+            frame.columns = pd.Index(columns, name=columns.name)
+        return frame
+
+    if kind == "series":
+        series = pd.read_parquet(os.path.join(directory, spec["file"]))["__series__"]
+        return series.rename(_decode(spec["name"], directory))
+
+    if kind == "bytes":
+        with open(os.path.join(directory, spec["file"]), "rb") as handle:
+            return handle.read()
+
+    if kind == "dict":
+        return {key: _decode(item, directory) for key, item in spec["items"]}
+
+    return spec["value"]
+
+#######################################################################################
+#######################################################################################
+
+
+class DiskCache:
+    """Size-bounded on-disk cache with atomic writes, shared between processes."""
+
+    def __init__(self, directory=CACHE_DIR, max_bytes=MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        digest = hashlib.sha256(repr((CODE_HASH, key)).encode("utf-8")).hexdigest()
+        return os.path.join(self.directory, digest[:40])
+
+    def get(self, key, default=None):
+        path = self._path(key)
+        try:
+            with open(os.path.join(path, MANIFEST), encoding="utf-8") as handle:
+                value = _decode(json.load(handle), path)
+            os.utime(path)  # recency for the LRU eviction
+        except (OSError, ValueError, KeyError, TypeError):
+            return default
+        return value
+
+    def put(self, key, value):
+        # Values that cannot be stored (unsupported types, full or read-only
+        # disk) are simply not cached
+        path = self._path(key)
+        if os.path.isdir(path):
+            return
+
+        try:
+            tmp = tempfile.mkdtemp(dir=self.directory, prefix=".tmp-")
+        except OSError:
+            return
+
+        try:
+            spec = _encode(value, tmp, [])
+            with open(os.path.join(tmp, MANIFEST), "w", encoding="utf-8") as handle:
+                json.dump(spec, handle)
+            os.rename(tmp, path)
+        except (OSError, TypeError, ValueError):
+            # Includes losing the race to another writer of the same key
+            shutil.rmtree(tmp, ignore_errors=True)
+            return
+
+        self.evict()
+
+    def get_or_compute(self, key, compute, *args):
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute(*args)
+            self.put(key, value)
+        return value
+
+    def _entries(self):
+        # (last use, size, path) of every entry, plus stale temporary directories
+        entries, stale = [], []
+        now = time.time()
+
+        for entry in os.scandir(self.directory):
+            try:
+                if entry.name.startswith("."):
+                    if now - entry.stat().st_mtime > STALE_TMP_SECONDS:
+                        stale.append(entry.path)
+                    continue
+
+                size = sum(item.stat().st_size for item in os.scandir(entry.path))
+                entries.append((entry.stat().st_mtime, size, entry.path))
+            except OSError:
+                continue  # removed by another process meanwhile
+
+        return entries, stale
+
+    def _remove(self, path):
+        # Rename first: readers never see a half-deleted entry
+        doomed = os.path.join(self.directory, f".evict-{uuid.uuid4().hex}")
+        try:
+            os.rename(path, doomed)
+        except OSError:
+            return
+        shutil.rmtree(doomed, ignore_errors=True)
+
+    def evict(self):
+        entries, stale = self._entries()
+
+        for path in stale:
+            shutil.rmtree(path, ignore_errors=True)
+
+        total = sum(size for _, size, _ in entries)
+
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            self._remove(path)
+            total -= size
+
+    def size(self):
+        entries, _ = self._entries()
+        return len(entries), sum(size for _, size, _ in entries)
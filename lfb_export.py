@@ -0,0 +1,101 @@
+
+import tempfile
+import zipfile
+
+import pandas as pd
+
+#######################################################################################
+#######################################################################################
+
+# Chunked export of dashboard tables and filtered rows as CSV or Parquet.
+#
+# Frames are written CHUNK_ROWS rows at a time (one Parquet row group, or one
+# encoded CSV block per chunk) into a spooled temporary file that moves to
+# disk once it outgrows SPOOL_MAX_BYTES. The full filtered frame is therefore
+# never rendered as one in-memory CSV string.
+
+CHUNK_ROWS = 100_000
+SPOOL_MAX_BYTES = 16 * 1024 * 1024
+
+FORMATS = {
+    "CSV": {"extension": "csv", "mime": "text/csv"},
+    "Parquet": {"extension": "parquet", "mime": "application/vnd.apache.parquet"},
+}
+
+#######################################################################################
+#######################################################################################
+
+
+def _flat(table):
+    # Export-friendly frame: named index levels become columns, labels strings
+    has_named_index = any(name is not None for name in table.index.names)
+    table = table.reset_index(drop=not has_named_index)
+    table.columns = [str(column) for column in table.columns]
+    return table
+
+
+def iter_chunks(df, chunk_rows=CHUNK_ROWS):
+    for start in range(0, max(len(df), 1), chunk_rows):
+        yield df.iloc[start:start + chunk_rows]
+
+
+def write_csv(df, sink, chunk_rows=CHUNK_ROWS):
+    for i, chunk in enumerate(iter_chunks(df, chunk_rows)):
+        sink.write(chunk.to_csv(index=False, header=(i == 0)).encode("utf-8"))
+
+
+def write_parquet(df, sink, chunk_rows=CHUNK_ROWS):
+    # pyarrow is only needed once an export is requested
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    writer = None
+    try:
+        for chunk in iter_chunks(df, chunk_rows):
+            if writer is None:
+                table = pa.Table.from_pandas(chunk, preserve_index=False)
+                writer = pq.ParquetWriter(sink, table.schema)
+            else:
+                # Reuse the first chunk's schema so all-null chunks still match
+                table = pa.Table.from_pandas(chunk, schema=writer.schema, preserve_index=False)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+WRITERS = {
+    "CSV": write_csv,
+    "Parquet": write_parquet,
+}
+
+#######################################################################################
+#######################################################################################
+
+
+def export_frame(df, file_format):
+    # Single frame -> rewound binary file object for st.download_button
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    WRITERS[file_format](_flat(df), spool)
+    spool.seek(0)
+    return spool
+
+
+def export_tables(tables, file_format):
+    # {name: frame} -> zip archive with one file per table, written chunk-wise
+    extension = FORMATS[file_format]["extension"]
+
+    spool = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_BYTES)
+    with zipfile.ZipFile(spool, "w", compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, table in tables.items():
+            with archive.open(f"{name}.{extension}", "w", force_zip64=True) as entry:
+                WRITERS[file_format](_flat(table), entry)
+
+    spool.seek(0)
+    return spool
+
+
+def kpi_table(kpis):
+    return pd.DataFrame(
+        {"KPI": list(kpis), "Value": [float(value) for value in kpis.values()]}
+    )
@@ -0,0 +1,110 @@
+
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from functools import lru_cache
+
+#######################################################################################
+#######################################################################################
+
+# Figure lifecycle for the dashboard charts.
+#
+# Charts draw into plain matplotlib `Figure` objects, never into pyplot's
+# global figure manager, so nothing accumulates across reruns and there are
+# no "More than 20 figures" warnings. Figures are pooled per chart and reused:
+# template charts (see lfb_charts.py) keep their artists and only swap data,
+# the others clear the figure and redraw on the same canvas.
+#
+# The seaborn theme and the palettes are resolved once per process. matplotlib
+# and seaborn are imported on first use, not when this module is imported.
+
+POOL_SIZE = 4
+
+#######################################################################################
+#######################################################################################
+
+
+@lru_cache(maxsize=None)
+def apply_theme():
+    import seaborn as sns
+
+    sns.set_theme(style="white")  # removes background grid
+
+
+@lru_cache(maxsize=None)
+def palette(name, n_colors=None):
+    import seaborn as sns
+
+    return tuple(sns.color_palette(name, n_colors))
+
+
+def chart(figsize, nrows=1, ncols=1, **subplot_kw):
+    # Declares a chart: draw(fig, *data) draws into fig, whose axes are laid
+    # out from these settings when the figure is first built (or cleared)
+    def decorate(draw):
+        draw.figsize = figsize
+        draw.layout = (nrows, ncols, subplot_kw)
+        return draw
+    return decorate
+
+
+def template(fig):
+    # Artist registry of a template chart; empty until its first draw
+    if not hasattr(fig, "lfb_template"):
+        fig.lfb_template = {}
+    return fig.lfb_template
+
+
+def reset(fig, draw):
+    # Start from a blank canvas in the chart's own layout
+    fig.clear()
+    template(fig).clear()
+    nrows, ncols, subplot_kw = draw.layout
+    return fig.subplots(nrows, ncols, **subplot_kw)
+
+#######################################################################################
+#######################################################################################
+
+
+class FigureManager:
+    """Per-chart pools of reusable Figure objects, safe across session threads."""
+
+    def __init__(self, pool_size=POOL_SIZE):
+        self.pool_size = pool_size
+        self._pools = defaultdict(list)
+        self._lock = threading.Lock()
+
+    def _checkout(self, draw):
+        with self._lock:
+            pool = self._pools[draw.__name__]
+            if pool:
+                return pool.pop()
+        from matplotlib.figure import Figure
+
+        # Axes are laid out by the chart itself (see reset)
+        return Figure(figsize=draw.figsize)
+
+    def _checkin(self, draw, fig):
+        with self._lock:
+            pool = self._pools[draw.__name__]
+            if len(pool) < self.pool_size:
+                pool.append(fig)
+
+    @contextmanager
+    def draw(self, draw, *args):
+        # Yields the drawn figure; it goes back to the pool afterwards, so it
+        # must be rendered (st.pyplot / savefig) inside the with-block
+        apply_theme()
+        fig = self._checkout(draw)
+
+        try:
+            draw(fig, *args)
+            yield fig
+        except BaseException:
+            # A half-drawn figure is not returned to the pool
+            raise
+        else:
+            self._checkin(draw, fig)
+
+
+figures = FigureManager()
@@ -0,0 +1,206 @@
+
+import numpy as np
+import pandas as pd
+
+import lfb_timeindex as timeindex
+from lfb_aggregations import WEEKDAY_ORDER
+
+#######################################################################################
+#######################################################################################
+
+# Hour-of-day x weekday demand forecast.
+#
+# Distinct incidents per calendar hour are modelled by ordinary least squares
+# as an hour x weekday profile (168 terms), plus a month-of-year effect
+# (January is the reference month) and a linear trend in years:
+#
+#     incidents(day, hour) = profile[weekday, hour] + season[month] + trend * t
+#
+# The fit uses the normal equations. Each calendar month (clipped to the data
+# window) contributes X'X, X'y and y'y, so a fit is the sum of the month
+# statistics plus one small solve. update_statistics() computes only the
+# months it does not already have: extending a window, or a new month of
+# data, costs one month of work.
+#
+# Short windows cannot support every term. Below MIN_PROFILE_DAYS there is no
+# forecast at all: the profile needs every weekday several times over, and a
+# weekday the window never covers would be forecast as 0 incidents. Below
+# MIN_SEASONAL_DAYS the model keeps only the hour x weekday profile. Below
+# MIN_TREND_DAYS, where the trend cannot be told apart from the season, it
+# also leaves out the trend.
+
+N_PROFILE = 7 * 24
+MONTH_COLUMNS = slice(N_PROFILE, N_PROFILE + 11)
+TREND = N_PROFILE + 11
+N_FEATURES = TREND + 1
+
+# Trend origin; a fixed date keeps month statistics additive across windows
+TREND_ORIGIN = pd.Timestamp("2000-01-01")
+
+MIN_PROFILE_DAYS = 28
+MIN_SEASONAL_DAYS = 365
+MIN_TREND_DAYS = 730
+
+HORIZON_WEEKS = 4
+
+TITLE = f"Expected Incidents by Hour and Weekday: Next {HORIZON_WEEKS} Weeks"
+
+#######################################################################################
+#######################################################################################
+
+
+def history_days(df):
+    # Calendar days spanned by the call dates of df (sorted by CallDate)
+    if df.empty:
+        return 0
+    return (df["CallDate"].iloc[-1].normalize() - df["CallDate"].iloc[0].normalize()).days + 1
+
+
+def forecastable(df, selections):
+    # A month across all years is not a contiguous series to forecast from,
+    # and a short window does not cover every weekday several times
+    return "Month" not in selections and history_days(df) >= MIN_PROFILE_DAYS
+
+
+def month_spans(start, end):
+    # (first day, last day) of every calendar month in [start, end], clipped
+    start, end = pd.Timestamp(start).normalize(), pd.Timestamp(end).normalize()
+    return [
+        (max(month.start_time, start), min(month.end_time.normalize(), end))
+        for month in pd.period_range(start, end, freq="M")
+    ]
+
+
+def design(days):
+    # One row per (day, hour) of consecutive days, hour fastest
+    n_rows = len(days) * 24
+    rows = np.arange(n_rows)
+    day = rows // 24
+    hour = rows % 24
+
+    X = np.zeros((n_rows, N_FEATURES))
+    X[rows, days.weekday.to_numpy()[day] * 24 + hour] = 1.0
+
+    month = days.month.to_numpy()[day]
+    seasonal = month > 1
+    X[rows[seasonal], MONTH_COLUMNS.start + month[seasonal] - 2] = 1.0
+
+    X[:, TREND] = ((days - TREND_ORIGIN).days.to_numpy()[day] + hour / 24) / 365.25
+    return X
+
+
+def hourly_counts(df, days):
+    # Distinct incidents per (day, hour), shaped (len(days), 24); df holds
+    # the rows of those days
+    day = days.get_indexer(df["CallDate"].dt.normalize())
+    cells = day * 24 + df["HourOfCall"].to_numpy()
+
+    incidents, numbers = pd.factorize(df["IncidentNumber"])
+    valid = (day >= 0) & (incidents >= 0)
+
+    # Distinct (cell, incident) pairs, then one count per cell
+    pairs = pd.unique(cells[valid].astype(np.int64) * max(len(numbers), 1) + incidents[valid])
+    counts = np.bincount(pairs // max(len(numbers), 1), minlength=len(days) * 24)
+
+    return counts.reshape(len(days), 24).astype(float)
+
+
+def update_statistics(statistics, df, start, end):
+    # Normal-equation statistics of every month span of [start, end], reusing
+    # those already in statistics. df is sorted by CallDate and holds every
+    # row of the window.
+    statistics = dict(statistics or {})
+
+    for first, last in month_spans(start, end):
+        if (first, last) in statistics:
+            continue
+
+        days = pd.date_range(first, last, freq="D")
+        y = hourly_counts(timeindex.date_range_slice(df, first, last), days).ravel()
+        X = design(days)
+
+        statistics[(first, last)] = {"xtx": X.T @ X, "xty": X.T @ y, "yty": y @ y, "n": len(y)}
+
+    return statistics
+
+
+def fit(statistics, spans):
+    xtx = sum(statistics[span]["xtx"] for span in spans)
+    xty = sum(statistics[span]["xty"] for span in spans)
+    yty = sum(statistics[span]["yty"] for span in spans)
+    n = sum(statistics[span]["n"] for span in spans)
+
+    days = n // 24
+    if days < MIN_PROFILE_DAYS:
+        raise ValueError(f"A forecast needs at least {MIN_PROFILE_DAYS} days of history, got {days}")
+
+    seasonal = days >= MIN_SEASONAL_DAYS
+    trend = days >= MIN_TREND_DAYS
+    columns = np.arange(N_FEATURES if trend else TREND if seasonal else N_PROFILE)
+
+    # Every kept column is observed: MIN_PROFILE_DAYS covers each weekday and
+    # hour, a year each month, and two years separate trend from season
+    # (filtered-out hours are observed too, as 0 incidents). lstsq only
+    # guards against ill-conditioning.
+    solution = np.linalg.lstsq(xtx[np.ix_(columns, columns)], xty[columns], rcond=None)[0]
+    coefficients = np.zeros(N_FEATURES)
+    coefficients[columns] = solution
+
+    rss = yty - 2 * coefficients @ xty + coefficients @ xtx @ coefficients
+
+    # rmse: incidents per hour; trend_per_year: change of daily incidents
+
+    return {
+        "coefficients": coefficients,
+        "seasonal": seasonal,
+        "trend": trend,
+        "days": days,
+        "rmse": float(np.sqrt(max(rss, 0.0) / n)) if n else float("nan"),
+        "trend_per_year": float(coefficients[TREND]) * 24 if trend else float("nan"),
+    }
+
+
+def forecast(model, start, weeks=HORIZON_WEEKS):
+    # Expected incidents per hour of the weeks from start, (days x 24)
+    days = pd.date_range(start, periods=weeks * 7, freq="D", name="Date")
+    expected = np.clip(design(days) @ model["coefficients"], 0, None)
+
+    return pd.DataFrame(
+        expected.reshape(len(days), 24),
+        index=days,
+        columns=pd.RangeIndex(24, name="HourOfCall")
+    )
+
+
+def demand_forecast(df, statistics=None, weeks=HORIZON_WEEKS):
+    # Forecast for the weeks after the last call date of df (sorted by
+    # CallDate), fitted on its whole date span. Returns the forecast and the
+    # updated month statistics, for reuse by later calls on the same rows.
+    start, end = df["CallDate"].iloc[0], df["CallDate"].iloc[-1]
+
+    statistics = update_statistics(statistics, df, start, end)
+    model = fit(statistics, month_spans(start, end))
+    hourly = forecast(model, end.normalize() + pd.Timedelta(days=1), weeks)
+
+    # Average expected incidents per hour, hours 0–23 by Monday → Sunday
+    profile = (
+        hourly
+        .groupby(hourly.index.day_name())
+        .mean()
+        .T
+        .reindex(columns=WEEKDAY_ORDER)
+        .rename_axis(columns="CallWeekday")
+    )
+
+    result = {
+        "profile": profile,
+        "daily": hourly.sum(axis=1).rename("ExpectedIncidents"),
+        "start": str(hourly.index[0].date()),
+        "end": str(hourly.index[-1].date()),
+        "fitted_days": int(model["days"]),
+        "seasonal": bool(model["seasonal"]),
+        "trend": bool(model["trend"]),
+        "rmse": model["rmse"],
+        "trend_per_year": model["trend_per_year"],
+    }
+    return result, statistics
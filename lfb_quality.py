@@ -0,0 +1,151 @@
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from lfb_aggregations import INCIDENT_GROUPS
+
+#######################################################################################
+#######################################################################################
+
+# Schema and data-quality checks of the raw incident dataset, run by
+# lfb_data.prepare_data before any feature engineering.
+#
+# A missing column or a column of the wrong kind (e.g. numbers where incident
+# groups are expected) fails the load with a SchemaError naming the column.
+# Row-level problems (unparsable dates, out-of-range times, unknown incident
+# groups, ...) quarantine the row instead: it is removed from the dashboard
+# data and kept aside with the checks it failed. All checks are whole-column
+# vectorized operations.
+#
+# Column spec:
+#     type           "numeric", "datetime" or "string"
+#     nullable       False quarantines rows with a missing value
+#     max_null_rate  above this share of missing values a warning is raised
+#     range          (low, high), inclusive, for numeric columns
+#     values         allowed values of a string column
+#     format         strptime format every value of a string column must match
+
+# Clock time of TimeOfCall, also used to parse it in lfb_data.add_features
+TIME_FORMAT = "%H:%M:%S"
+
+SCHEMA = {
+    "IncidentNumber": {"type": "string"},
+    "CallDate": {"type": "datetime", "nullable": False},
+    "TimeOfCall": {"type": "string", "nullable": False, "format": TIME_FORMAT},
+    "IncidentGroup": {"type": "string", "nullable": False, "values": INCIDENT_GROUPS},
+    "IncGeo_BoroughName": {"type": "string", "max_null_rate": 0.01},
+    "FirstPumpArriving_AttendanceTime": {"type": "numeric", "range": (0, 3600), "max_null_rate": 0.10},
+    "SecondPumpArriving_AttendanceTime": {"type": "numeric", "range": (0, 7200)},
+    "NumPumpsAttending": {"type": "numeric", "range": (0, 100), "max_null_rate": 0.10},
+    "TurnoutTimeSeconds": {"type": "numeric", "range": (0, 1800), "max_null_rate": 0.10},
+    "TravelTimeSeconds": {"type": "numeric", "range": (0, 3600), "max_null_rate": 0.10},
+    "DelayCode_Description": {"type": "string"},
+}
+
+
+class SchemaError(ValueError):
+    """The dataset lacks a required column or holds one of the wrong kind."""
+
+
+#######################################################################################
+#######################################################################################
+
+
+def _check_column(df, column, spec, failures, warnings, converted):
+    values = df[column]
+    kind = spec["type"]
+    missing = values.isna().to_numpy()
+
+    if kind == "numeric" and not pd.api.types.is_numeric_dtype(values):
+        values = converted[column] = pd.to_numeric(values, errors="coerce")
+        failures[f"{column}: not a number"] = values.isna().to_numpy() & ~missing
+
+    elif kind == "datetime" and not pd.api.types.is_datetime64_any_dtype(values):
+        values = converted[column] = pd.to_datetime(values, errors="coerce")
+        failures[f"{column}: not a date"] = values.isna().to_numpy() & ~missing
+
+    elif kind == "string" and not (
+        pd.api.types.is_string_dtype(values)
+        or pd.api.types.is_object_dtype(values)
+        or isinstance(values.dtype, pd.CategoricalDtype)
+        or values.isna().all()
+    ):
+        raise SchemaError(f"Column {column!r} should hold text, found {values.dtype}")
+
+    null_rate = float(missing.mean()) if len(missing) else 0.0
+
+    if not spec.get("nullable", True):
+        failures[f"{column}: missing"] = missing
+    elif null_rate > spec.get("max_null_rate", 1.0):
+        warnings.append(
+            f"{column}: {null_rate:.1%} missing (expected at most {spec['max_null_rate']:.0%})"
+        )
+
+    if "range" in spec:
+        low, high = spec["range"]
+        array = values.to_numpy(dtype=float, na_value=np.nan)
+        with np.errstate(invalid="ignore"):
+            failures[f"{column}: outside {low}–{high}"] = (array < low) | (array > high)
+
+    if "values" in spec:
+        failures[f"{column}: unknown value"] = ~values.isin(spec["values"]).to_numpy() & ~missing
+
+    if "format" in spec:
+        parsed = pd.to_datetime(values, format=spec["format"], errors="coerce")
+        failures[f"{column}: not in {spec['format']} format"] = parsed.isna().to_numpy() & ~missing
+
+    return null_rate
+
+
+def validate(df, schema=SCHEMA):
+    # Returns the valid rows and a report with the quality summary and the
+    # quarantined rows (as loaded, plus a QualityIssues column). Columns of
+    # the valid rows are converted to their schema type.
+    started = time.perf_counter()
+
+    missing_columns = [column for column in schema if column not in df.columns]
+    if missing_columns:
+        raise SchemaError(f"Dataset is missing required columns: {', '.join(missing_columns)}")
+
+    failures = {}
+    warnings = []
+    converted = {}
+    null_rates = {
+        column: _check_column(df, column, spec, failures, warnings, converted)
+        for column, spec in schema.items()
+    }
+
+    bad = np.zeros(len(df), dtype=bool)
+    for mask in failures.values():
+        bad |= mask
+
+    if bad.any():
+        quarantine = df[bad].copy()
+
+        # Failed checks of each quarantined row, e.g. "CallDate: not a date"
+        issues = np.full(len(quarantine), "", dtype=object)
+        for check, mask in failures.items():
+            issues = np.where(mask[bad], issues + check + "; ", issues)
+        quarantine["QualityIssues"] = pd.Series(issues, index=quarantine.index).str.rstrip("; ")
+
+    else:
+        quarantine = df.iloc[:0].assign(QualityIssues=pd.Series(dtype=object))
+
+    # Quarantined rows keep their values as loaded, valid rows get schema types
+    valid = df.assign(**converted) if converted else df
+    if bad.any():
+        valid = valid[~bad].reset_index(drop=True)
+
+    summary = {
+        "rows": int(len(bad)),
+        "valid_rows": int(len(valid)),
+        "quarantined_rows": int(bad.sum()),
+        "checks": {check: int(mask.sum()) for check, mask in failures.items() if mask.any()},
+        "null_rates": null_rates,
+        "warnings": warnings,
+        "seconds": time.perf_counter() - started,
+    }
+
+    return valid, {"summary": summary, "quarantine": quarantine}
@@ -0,0 +1,269 @@
+
+"""Offline static report generator.
+
+Renders every dashboard chart for every (year, month) filter state to one
+HTML and/or PDF report per state, plus an index.html, fanning the states out
+across a process pool:
+
+    python lfb_report.py --output-dir reports --format html pdf --workers 8
+"""
+
+import argparse
+import base64
+import html
+import io
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+from matplotlib.backends.backend_pdf import PdfPages
+from matplotlib.figure import Figure
+
+import lfb_aggregations as agg
+import lfb_bitmap as bitmap
+import lfb_charts as charts
+import lfb_data as data
+import lfb_forecast as forecast
+import lfb_sections as sections
+import lfb_timeindex as timeindex
+from lfb_backend import get_backend
+from lfb_comparison import KPI_LABELS
+from lfb_figures import figures
+
+MONTHS = [
+    "January","February","March","April","May","June",
+    "July","August","September","October","November","December"
+]
+
+#######################################################################################
+#######################################################################################
+
+# Shared, read-only inputs of every worker: the prepared frame and the
+# aggregates built from it once in the parent (daily pre-aggregates for the
+# KPI block, bitmap index for month-across-years states).
+_shared = {}
+
+
+def _init_worker(df, daily_aggregates, bitmap_index, backend_name):
+    _shared.update(
+        df=df,
+        daily_aggregates=daily_aggregates,
+        bitmap_index=bitmap_index,
+        backend=get_backend(backend_name),
+    )
+
+
+def filter_states(df, years=None):
+    years = years or sorted(int(year) for year in df["Year"].unique())
+    return [(year, month) for year in ["All"] + years for month in ["All"] + MONTHS]
+
+
+def state_slug(year, month):
+    return f"{year}_{month}".lower()
+
+
+def select_state(df, daily_aggregates, bitmap_index, backend, year, month):
+    # Same selection and KPI logic as the dashboard sidebar (lfb_timeindex,
+    # lfb_sections)
+    window, selections = timeindex.year_month_selection(
+        df["CallDate"].iloc[0], df["CallDate"].iloc[-1],
+        year, MONTHS.index(month) + 1 if month != "All" else None
+    )
+    _, _, rows = sections.select_rows(df, bitmap_index, window, selections)
+
+    kpis = sections.selection_kpis(
+        daily_aggregates, None if selections else window,
+        lambda: agg.compute_kpis(rows, backend)
+    )
+
+    return rows, kpis, selections
+
+
+def report_sections(rows, selections, backend):
+    # (heading, chart builders, section) of every chart of a state in page
+    # order: the dashboard sections, with the demand forecast after the
+    # hourly heatmap where the dashboard shows one
+    for name, (heading, compute) in sections.SECTIONS.items():
+        section = compute(rows, backend)
+
+        if name == "extreme_delays" and section["delay_counts_extreme"].empty:
+            continue
+
+        yield heading, charts.CHARTS[name], section
+
+        if name == "hourly_heatmap" and forecast.forecastable(rows, selections):
+            yield forecast.TITLE, [charts.demand_forecast_chart], forecast.demand_forecast(rows)[0]
+
+#######################################################################################
+#######################################################################################
+
+
+def _figure_png(fig):
+    buffer = io.BytesIO()
+    fig.savefig(buffer, format="png", dpi=100, bbox_inches="tight")
+    return buffer.getvalue()
+
+
+def _kpi_figure(title, kpis):
+    fig = Figure(figsize=(8.27, 11.69))
+    lines = [title, ""] + [f"{KPI_LABELS[kpi]}: {value:,.2f}" for kpi, value in kpis.items()]
+    fig.text(0.08, 0.92, "\n".join(lines), va="top", fontsize=12, family="monospace")
+    return fig
+
+
+def _html_report(title, kpis, images):
+    kpi_rows = "\n".join(
+        f"<tr><td>{html.escape(KPI_LABELS[kpi])}</td><td>{value:,.2f}</td></tr>"
+        for kpi, value in kpis.items()
+    )
+    figures = "\n".join(
+        f"<h2>{html.escape(heading)}</h2>\n"
+        f'<img src="data:image/png;base64,{base64.b64encode(png).decode("ascii")}">'
+        for heading, png in images
+    )
+    return f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>{html.escape(title)}</title>
+<style>body{{font-family:sans-serif;margin:2em}}img{{max-width:100%}}td{{padding:2px 12px}}</style>
+</head><body>
+<h1>{html.escape(title)}</h1>
+<table>{kpi_rows}</table>
+{figures}
+</body></html>
+"""
+
+
+def render_state(state, output_dir, formats):
+    year, month = state
+    started = time.perf_counter()
+
+    rows, kpis, selections = select_state(
+        _shared["df"], _shared["daily_aggregates"], _shared["bitmap_index"],
+        _shared["backend"], year, month
+    )
+
+    slug = state_slug(year, month)
+    title = f"London Fire Brigade Incident & Response Time Analysis — {year} | {month}"
+
+    if rows.empty:
+        return {"state": state, "slug": slug, "files": [], "charts": 0,
+                "seconds": time.perf_counter() - started}
+
+    images = []
+    pdf = PdfPages(os.path.join(output_dir, f"{slug}.pdf")) if "pdf" in formats else None
+
+    try:
+        if pdf is not None:
+            pdf.savefig(_kpi_figure(title, kpis))
+
+        for heading, chart_builders, section in report_sections(rows, selections, _shared["backend"]):
+            for chart in chart_builders:
+                with figures.draw(chart, section) as fig:
+                    if "html" in formats:
+                        images.append((heading, _figure_png(fig)))
+                    if pdf is not None:
+                        pdf.savefig(fig)
+    finally:
+        if pdf is not None:
+            pdf.close()
+
+    files = []
+    if "html" in formats:
+        with open(os.path.join(output_dir, f"{slug}.html"), "w", encoding="utf-8") as handle:
+            handle.write(_html_report(title, kpis, images))
+        files.append(f"{slug}.html")
+    if pdf is not None:
+        files.append(f"{slug}.pdf")
+
+    return {
+        "state": state,
+        "slug": slug,
+        "files": files,
+        "charts": len(images) if "html" in formats else None,
+        "kpis": kpis,
+        "seconds": time.perf_counter() - started,
+    }
+
+
+def write_index(output_dir, results, elapsed):
+    rows = []
+    for result in sorted(results, key=lambda result: result["slug"]):
+        year, month = result["state"]
+        links = " ".join(
+            f'<a href="{html.escape(name)}">{html.escape(name.rsplit(".", 1)[1].upper())}</a>'
+            for name in result["files"]
+        ) or "no data"
+        rows.append(
+            f"<tr><td>{year}</td><td>{month}</td><td>{links}</td>"
+            f"<td>{result['seconds']:.1f}s</td></tr>"
+        )
+
+    with open(os.path.join(output_dir, "index.html"), "w", encoding="utf-8") as handle:
+        handle.write(f"""<!DOCTYPE html>
+<html><head><meta charset="utf-8"><title>LFB Reports</title>
+<style>body{{font-family:sans-serif;margin:2em}}td,th{{padding:2px 12px;text-align:left}}</style>
+</head><body>
+<h1>London Fire Brigade Reports</h1>
+<p>{len(results)} filter states rendered in {elapsed:.1f}s.</p>
+<table><tr><th>Year</th><th>Month</th><th>Report</th><th>Render time</th></tr>
+{chr(10).join(rows)}
+</table>
+</body></html>
+""")
+
+#######################################################################################
+#######################################################################################
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default=data.DATA_PATH, help="incident parquet file")
+    parser.add_argument("--output-dir", default="reports")
+    parser.add_argument("--format", nargs="+", choices=["html", "pdf"], default=["html"])
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--engine", default="pandas", help="query backend (see lfb_backend.py)")
+    parser.add_argument("--years", type=int, nargs="*", help="limit to these years")
+    args = parser.parse_args(argv)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+
+    started = time.perf_counter()
+
+    # Shared aggregates are built once here, not once per state
+    df, quality_report = data.load_prepared_data_with_quality(args.data)
+    daily_aggregates = timeindex.build_daily_aggregates(df)
+    bitmap_index = bitmap.build_bitmap_index(df, data.BITMAP_COLUMNS)
+
+    prepared = time.perf_counter()
+
+    states = filter_states(df, args.years)
+    results = []
+
+    with ProcessPoolExecutor(
+        max_workers=args.workers,
+        initializer=_init_worker,
+        initargs=(df, daily_aggregates, bitmap_index, args.engine),
+    ) as pool:
+        futures = [pool.submit(render_state, state, args.output_dir, args.format) for state in states]
+
+        for future in as_completed(futures):
+            result = future.result()
+            results.append(result)
+            print(f"[{len(results)}/{len(states)}] {result['slug']} ({result['seconds']:.1f}s)")
+
+    elapsed = time.perf_counter() - started
+    write_index(args.output_dir, results, elapsed)
+
+    rendered = [result for result in results if result["files"]]
+    render_seconds = elapsed - (prepared - started)
+
+    print(
+        f"\n{len(rendered)} reports ({len(states) - len(rendered)} empty states) "
+        f"in {elapsed:.1f}s: load {prepared - started:.1f}s, render {render_seconds:.1f}s "
+        f"with {args.workers} workers = {len(states) / render_seconds:.2f} states/s"
+    )
+    print(f"Quarantined by validation: {quality_report['summary']['quarantined_rows']:,} rows")
+    print(f"Index: {os.path.join(args.output_dir, 'index.html')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,191 @@
+
+import numpy as np
+import pandas as pd
+
+import lfb_aggregations as agg
+import lfb_bitmap as bitmap
+import lfb_timeindex as timeindex
+
+#######################################################################################
+#######################################################################################
+
+# Per-section computations of the dashboard.
+#
+# Each section turns the filtered incident frame into the tables (and scalars)
+# its chart and text need. The dashboard and the offline report generator
+# (lfb_report.py) both go through these functions, and the matching chart
+# builders live in lfb_charts.py under the same section name. Results hold
+# aggregates only (distributions as binned counts, not row-level values), so
+# they stay small in the shared and on-disk caches.
+
+DISTRIBUTION_BANDS = [0, 4, 6, 8, 20]
+DISTRIBUTION_BAND_LABELS = ["<4 min", "4–6 min", "6–8 min", ">8 min"]
+
+# Histogram bins of the attendance distribution charts
+HISTOGRAM_BINS = 60
+HISTOGRAM_BINS_BY_TYPE = 50
+
+#######################################################################################
+#######################################################################################
+
+
+def monthly_trends(df, backend=None):
+    return {
+        "by_type": agg.monthly_incidents_by_type(df, backend),
+        "total": agg.monthly_incidents_total(df, backend),
+    }
+
+
+def hourly_heatmap(df, backend=None):
+    return {"daily_hourly_incidents": agg.daily_hourly_incidents(df, backend)}
+
+
+def monthly_response(df, backend=None):
+    return {
+        "by_type": agg.avg_firstpump_attendance_by_type(df, backend),
+        "total": agg.avg_firstpump_attendance_total(df, backend),
+    }
+
+
+def borough_response(df, backend=None):
+    return {"median_response_by_borough": agg.median_response_by_borough(df, backend)}
+
+
+def borough_compliance(df, backend=None):
+    return {"compliance_by_borough": agg.compliance_by_borough(df, backend)}
+
+
+def response_bands(df, backend=None):
+    return {
+        "band_pivot": agg.band_pivot(df, backend),
+        "extreme_delay_rate": (df["FirstPumpArriving_AttendanceTime"] / 60 > 10).mean() * 100,
+    }
+
+
+def histogram(minutes, bins):
+    # Equal-width bins over the range of the values, as histplot draws them
+    values = minutes.dropna().to_numpy(dtype=float)
+    if len(values):
+        counts, edges = np.histogram(values, bins=bins)
+    else:
+        counts, edges = np.zeros(bins, dtype=np.int64), np.linspace(0, 1, bins + 1)
+
+    return pd.DataFrame({"left": edges[:-1], "right": edges[1:], "count": counts})
+
+
+def attendance_distribution(df, backend=None):
+    response_minutes = df["FirstPumpArriving_AttendanceTime"] / 60
+
+    band_distribution = (
+        pd.cut(response_minutes, bins=DISTRIBUTION_BANDS, labels=DISTRIBUTION_BAND_LABELS)
+        .value_counts(normalize=True)
+        .sort_index()
+        .mul(100)
+        .round(1)
+    )
+
+    return {
+        "histogram": histogram(response_minutes, HISTOGRAM_BINS),
+        "median": response_minutes.median(),
+        "mean": response_minutes.mean(),
+        "p90": response_minutes.quantile(0.90),
+        "band_distribution": band_distribution,
+        "extreme_delay_share": (response_minutes > 10).mean() * 100,
+    }
+
+
+def distribution_by_type(df, backend=None):
+    return {
+        "histograms": {
+            incident: histogram(
+                df.loc[df["IncidentGroup"] == incident, "FirstPumpArriving_AttendanceTime"] / 60,
+                HISTOGRAM_BINS_BY_TYPE
+            )
+            for incident in agg.DECOMPOSITION_ORDER
+        }
+    }
+
+
+def decomposition(df, backend=None):
+    return {"decomposition": agg.decomposition(df, backend)}
+
+
+def percentile_decomposition(df, backend=None):
+    # Computed with the sort-once segment quantiles whatever the query backend
+    return {
+        "by_group": agg.percentile_decomposition(df, "IncidentGroup", order=agg.DECOMPOSITION_ORDER),
+        "by_borough": agg.percentile_decomposition(df, "IncGeo_BoroughName"),
+    }
+
+
+def extreme_delays(df, backend=None):
+    delay_counts_extreme = agg.delay_counts_extreme(df, backend)
+
+    pareto_df = delay_counts_extreme.head(10).copy()
+    pareto_df["ShortLabel"] = pareto_df["DelayCode_Description"].str.slice(0, 35)
+
+    return {
+        "delay_counts_extreme": delay_counts_extreme,
+        "pareto_df": pareto_df,
+        "top3_share": delay_counts_extreme.head(3)["Percent"].sum(),
+    }
+
+def volume_treemap(df, backend=None):
+    # Counts and histogram medians in one pass, whatever the query backend
+    return {"volume": agg.borough_group_volume(df)}
+
+
+def volume_treemap_range(daily, start, end):
+    # volume_treemap of a date window without dimension filters, from the
+    # load-time pre-aggregates (agg.build_borough_group_daily)
+    return {"volume": agg.borough_group_volume_range(daily, start, end)}
+
+#######################################################################################
+#######################################################################################
+
+# Section name -> (title, compute), in page order
+SECTIONS = {
+    "monthly_trends": ("Monthly Incident Trends by Incident Type", monthly_trends),
+    "hourly_heatmap": ("Daily and Hourly Incident Heatmap", hourly_heatmap),
+    "monthly_response": ("Monthly Response Performance by Incident Type", monthly_response),
+    "borough_response": ("Response Performance by Borough", borough_response),
+    "borough_compliance": ("First Pump Response Performance Against the 6-Minute Target", borough_compliance),
+    "response_bands": ("Response Time Bands Distribution", response_bands),
+    "attendance_distribution": ("Distribution of First Pump Attendance Time", attendance_distribution),
+    "distribution_by_type": ("Response Time Distribution by Incident Type", distribution_by_type),
+    "decomposition": ("Response Time Decomposition: Turnout vs Travel", decomposition),
+    "percentile_decomposition": ("Turnout vs Travel at P50 / P90 / P95", percentile_decomposition),
+    "extreme_delays": ("Extreme Delays (>10 minutes): Pareto Analysis", extreme_delays),
+    "volume_treemap": ("Incident Volume by Borough and Incident Type", volume_treemap),
+}
+
+
+def compute_section(name, df, backend=None):
+    return SECTIONS[name][1](df, backend)
+
+#######################################################################################
+#######################################################################################
+
+# Filter states, resolved the same way by the dashboard and the offline report
+
+
+def select_rows(df, bitmap_index, window, selections):
+    # Row positions [lo, hi) of the date window (binary search on the
+    # CallDate-sorted frame) and the selected rows: a read-only view of the
+    # window, or the intersection of the selected values' bitmaps within it
+    lo, hi = timeindex.date_bounds(df, *window)
+    if selections:
+        return lo, hi, df.take(bitmap.select_rows(bitmap_index, selections, lo, hi))
+    return lo, hi, df.iloc[lo:hi]
+
+
+def selection_kpis(daily_aggregates, window, row_kpis):
+    # KPIs of a selection. A date window without dimension filters (window
+    # None otherwise) is served from the daily pre-aggregates; other
+    # selections, or a percentile beyond the attendance histogram, fall back
+    # to row_kpis(), computed on the selected rows.
+    if window is not None:
+        kpis = timeindex.range_kpis(daily_aggregates, *window)
+        if not np.isnan([kpis["median_response"], kpis["p90_response"]]).any():
+            return kpis
+    return row_kpis()
@@ -0,0 +1,171 @@
+
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import pandas as pd
+
+#######################################################################################
+#######################################################################################
+
+# Computations shared by all dashboard sessions of a process.
+#
+# Results are keyed by (filter state, section). The first session asking for
+# a key runs the computation, on the worker pool (submit) or in its own
+# thread (compute); sessions asking for the same key while it runs wait on
+# the same future (single-flight) instead of repeating it, and later sessions
+# get the finished result from a bounded LRU.
+#
+# CPU time is accounted per session: each computation's thread CPU time is
+# charged to the session that started it, and the dashboard adds the CPU time
+# of its own script runs (filters, KPI header, chart rendering). Work done on
+# DuckDB's internal threads is not included.
+
+# Finished results kept for later sessions (section results are aggregate
+# tables, binned distributions included)
+MAX_RESULTS = 256
+
+# Sessions kept in the CPU report
+MAX_SESSIONS = 256
+
+# Keys kept by a StatisticsStore
+MAX_STATISTICS = 32
+
+#######################################################################################
+#######################################################################################
+
+
+def _session_stats():
+    return {
+        "runs": 0,
+        "script_cpu_seconds": 0.0,
+        "compute_cpu_seconds": 0.0,
+        "computed": 0,
+        "joined": 0,
+        "cached": 0,
+        "last_seen": None,
+    }
+
+
+class SharedComputations:
+    """Single-flight, LRU-cached computations with per-session CPU accounting."""
+
+    def __init__(self, executor, max_results=MAX_RESULTS, max_sessions=MAX_SESSIONS):
+        self.executor = executor
+        self.max_results = max_results
+        self.max_sessions = max_sessions
+        self._lock = threading.Lock()
+        self._in_flight = {}
+        self._results = OrderedDict()
+        self._sessions = OrderedDict()
+
+    def _stats(self, session):
+        # Caller holds the lock
+        stats = self._sessions.pop(session, None) or _session_stats()
+        stats["last_seen"] = pd.Timestamp.now()
+        self._sessions[session] = stats
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+        return stats
+
+    def _claim(self, key, session):
+        # (future of key, whether the caller must run the computation)
+        with self._lock:
+            stats = self._stats(session)
+
+            if key in self._results:
+                self._results.move_to_end(key)
+                stats["cached"] += 1
+                future = Future()
+                future.set_result(self._results[key])
+                return future, False
+
+            if key in self._in_flight:
+                stats["joined"] += 1
+                return self._in_flight[key], False
+
+            stats["computed"] += 1
+            future = self._in_flight[key] = Future()
+            return future, True
+
+    def submit(self, key, session, compute, *args):
+        # Future of compute(*args) on the worker pool, shared with every
+        # other request for key
+        future, owner = self._claim(key, session)
+        if owner:
+            self.executor.submit(self._run, key, session, future, compute, args)
+        return future
+
+    def compute(self, key, session, compute, *args):
+        # compute(*args) in the calling thread, or the result of the request
+        # for key already running or finished
+        future, owner = self._claim(key, session)
+        if owner:
+            self._run(key, session, future, compute, args)
+        return future.result()
+
+    def _run(self, key, session, future, compute, args):
+        started = time.thread_time()
+        try:
+            result = compute(*args)
+        except BaseException as error:
+            # Failures are not cached: the next request retries
+            with self._lock:
+                del self._in_flight[key]
+                self._stats(session)["compute_cpu_seconds"] += time.thread_time() - started
+            future.set_exception(error)
+            return
+
+        with self._lock:
+            del self._in_flight[key]
+            self._results[key] = result
+            while len(self._results) > self.max_results:
+                self._results.popitem(last=False)
+            self._stats(session)["compute_cpu_seconds"] += time.thread_time() - started
+
+        future.set_result(result)
+
+    def record_script_run(self, session, cpu_seconds):
+        with self._lock:
+            stats = self._stats(session)
+            stats["runs"] += 1
+            stats["script_cpu_seconds"] += cpu_seconds
+
+    def session_report(self):
+        # One row per session, most recently active first
+        with self._lock:
+            report = pd.DataFrame.from_dict(
+                {session: dict(stats) for session, stats in self._sessions.items()},
+                orient="index"
+            )
+
+        if report.empty:
+            return report
+
+        report["cpu_seconds"] = report["script_cpu_seconds"] + report["compute_cpu_seconds"]
+        return report.rename_axis("session").sort_values("last_seen", ascending=False)
+
+
+class StatisticsStore:
+    """Bounded LRU of reusable intermediate statistics, safe across pool threads."""
+
+    def __init__(self, max_entries=MAX_STATISTICS):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+
+    def get(self, key):
+        # Stored values are replaced, never modified, so they are returned as is
+        with self._lock:
+            if key not in self._entries:
+                return None
+            self._entries.move_to_end(key)
+            return self._entries[key]
+
+    def put(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
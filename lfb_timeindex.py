@@ -0,0 +1,191 @@
+
+import numpy as np
+import pandas as pd
+
+#######################################################################################
+#######################################################################################
+
+# Time index over the CallDate-sorted incident frame.
+#
+# Once the prepared frame is sorted by CallDate, any date window (a year, a
+# month, a storm weekend) is a contiguous block of rows that two binary
+# searches locate, so filtering is a slice instead of a boolean scan.
+#
+# The daily pre-aggregates hold one row per call date with additive KPI
+# components plus a per-day histogram of first pump attendance seconds, so the
+# KPI block for any range is served in time proportional to the number of days.
+
+# Attendance histogram resolution: 1-second bins up to 30 minutes. Times at or
+# beyond the cap land in an overflow bin; quantiles falling there are not
+# answered from the histogram.
+HIST_MAX_SECONDS = 1800
+
+# First pump attendance beyond 10 minutes counts as an extreme delay
+EXTREME_DELAY_SECONDS = 600
+
+#######################################################################################
+#######################################################################################
+
+
+def sort_by_call_date(df):
+    return df.sort_values("CallDate", kind="stable").reset_index(drop=True)
+
+
+def date_bounds(df, start, end):
+    # Row positions [lo, hi) covering call dates start..end (both inclusive)
+    dates = df["CallDate"].to_numpy()
+    lo = dates.searchsorted(np.datetime64(pd.Timestamp(start)), side="left")
+    hi = dates.searchsorted(
+        np.datetime64(pd.Timestamp(end) + pd.Timedelta(days=1)), side="left"
+    )
+    return lo, hi
+
+
+def date_range_slice(df, start, end):
+    lo, hi = date_bounds(df, start, end)
+    return df.iloc[lo:hi]
+
+
+def month_window(year, month):
+    start = pd.Timestamp(year=int(year), month=int(month), day=1)
+    return start, start + pd.offsets.MonthEnd(0)
+
+
+def year_window(year):
+    return pd.Timestamp(year=int(year), month=1, day=1), pd.Timestamp(year=int(year), month=12, day=31)
+
+
+def month_slice(df, year, month):
+    return date_range_slice(df, *month_window(year, month))
+
+
+def year_slice(df, year):
+    return date_range_slice(df, *year_window(year))
+
+
+def year_month_selection(first_date, last_date, year="All", month=None):
+    # (date window, bitmap selections) of the year / month filter of the
+    # dashboard and the report; year is "All" or a year, month None or 1-12.
+    # A month across all years is the whole range plus the Month bitmap.
+    if year == "All":
+        return (first_date, last_date), ({"Month": [month]} if month else {})
+    if month is None:
+        return year_window(year), {}
+    return month_window(year, month), {}
+
+#######################################################################################
+#######################################################################################
+
+
+def build_daily_aggregates(df):
+    # df must be sorted by CallDate (see sort_by_call_date)
+    dates = df["CallDate"].dt.normalize().to_numpy()
+    days, starts = np.unique(dates, return_index=True)
+    day_index = np.repeat(np.arange(len(days)), np.diff(np.append(starts, len(dates))))
+
+    attendance = df["FirstPumpArriving_AttendanceTime"].to_numpy(dtype=float)
+    has_attendance = ~np.isnan(attendance)
+    pumps = df["NumPumpsAttending"].to_numpy(dtype=float)
+    has_pumps = ~np.isnan(pumps)
+
+    def per_day(values):
+        return np.add.reduceat(values, starts) if len(starts) else np.array([])
+
+    table = pd.DataFrame({
+        "Incidents": per_day(np.ones(len(df), dtype=np.int64)),
+        "AttendanceCount": per_day(has_attendance.astype(np.int64)),
+        "AttendanceSum": per_day(np.where(has_attendance, attendance, 0.0)),
+        "Within6min": per_day(df["FirstPump_Within_6min"].to_numpy(dtype=np.int64)),
+        "SecondPump": per_day(df["SecondPumpArriving_AttendanceTime"].notna().to_numpy(dtype=np.int64)),
+        "PumpsCount": per_day(has_pumps.astype(np.int64)),
+        "PumpsSum": per_day(np.where(has_pumps, pumps, 0.0)),
+        "ExtremeDelays": per_day((attendance > EXTREME_DELAY_SECONDS).astype(np.int64)),
+    }, index=pd.DatetimeIndex(days, name="CallDate"))
+
+    for group in ["False Alarm", "Fire", "Special Service"]:
+        table[group] = per_day((df["IncidentGroup"] == group).to_numpy(dtype=np.int64))
+
+    # Per-day attendance histogram: one bincount over (day, second) cells
+    n_bins = HIST_MAX_SECONDS + 1
+    seconds = np.clip(np.floor(attendance[has_attendance]), 0, HIST_MAX_SECONDS).astype(np.int64)
+    cells = day_index[has_attendance] * n_bins + seconds
+    histogram = (
+        np.bincount(cells, minlength=len(days) * n_bins)
+        .reshape(len(days), n_bins)
+        .astype(np.int32)
+    )
+
+    return {"table": table, "histogram": histogram}
+
+
+def _day_bounds(daily, start, end):
+    days = daily["table"].index
+    lo = days.searchsorted(pd.Timestamp(start), side="left")
+    hi = days.searchsorted(pd.Timestamp(end), side="right")
+    return lo, hi
+
+
+def histogram_quantile(histogram, q):
+    # Matches pandas' default linear interpolation between order statistics,
+    # exactly for whole-second attendance times below the cap
+    counts = np.cumsum(histogram)
+    n = counts[-1] if len(counts) else 0
+    if n == 0:
+        return float("nan")
+
+    position = (n - 1) * q
+    below, above = int(np.floor(position)), int(np.ceil(position))
+
+    lower = int(np.searchsorted(counts, below, side="right"))
+    upper = int(np.searchsorted(counts, above, side="right"))
+
+    if upper >= HIST_MAX_SECONDS:
+        return float("nan")
+
+    return lower + (upper - lower) * (position - below)
+
+
+def histogram_quantiles(histograms, q):
+    # histogram_quantile for every row of a (days, bins) histogram array
+    counts = np.cumsum(histograms, axis=1)
+    n = counts[:, -1] if counts.shape[1] else np.zeros(len(counts))
+
+    position = (n - 1) * q
+    below, above = np.floor(position), np.ceil(position)
+
+    # Row-wise searchsorted(side="right"): number of cumulative counts <= value
+    lower = (counts <= below[:, None]).sum(axis=1)
+    upper = (counts <= above[:, None]).sum(axis=1)
+
+    result = lower + (upper - lower) * (position - below)
+    result[(n == 0) | (upper >= HIST_MAX_SECONDS)] = np.nan
+    return result
+
+
+def range_kpis(daily, start, end):
+    lo, hi = _day_bounds(daily, start, end)
+
+    totals = daily["table"].iloc[lo:hi].sum()
+    histogram = daily["histogram"][lo:hi].sum(axis=0)
+
+    incidents = int(totals["Incidents"])
+    attendance_count = totals["AttendanceCount"]
+
+    def share(value, count):
+        return value / count * 100 if count else float("nan")
+
+    def ratio(value, count):
+        return value / count if count else float("nan")
+
+    return {
+        "total_incidents": incidents,
+        "median_response": histogram_quantile(histogram, 0.5) / 60,
+        "response_within_6min": share(totals["Within6min"], incidents),
+        "false_alarm_rate": share(totals["False Alarm"], incidents),
+        "fire_rate": share(totals["Fire"], incidents),
+        "special_service_rate": share(totals["Special Service"], incidents),
+        "p90_response": histogram_quantile(histogram, 0.90) / 60,
+        "avg_response": ratio(totals["AttendanceSum"], attendance_count) / 60,
+        "second_pump_rate": share(totals["SecondPump"], incidents),
+        "avg_pumps": ratio(totals["PumpsSum"], totals["PumpsCount"]),
+    }
@@ -0,0 +1,581 @@
+
+"""Golden-results check of the dashboard's optimized computation paths.
+
+Recomputes the dashboard numbers with the original pandas code (the reference
+implementation below, as it stood in lfb_dashboard.py) and compares every
+optimized path against it: the query backends, the daily pre-aggregates, the
+bitmap filters, the segment quantile and histogram sketches and the on-disk
+cache round trip. Runs on a synthetic dataset with edge cases and, when the
+file exists, on the sample data; both paths are timed (best of --repeat).
+Exits with status 1 on any mismatch:
+
+    python lfb_verify.py --data lfb_streamlit.parquet --repeat 3
+"""
+
+import argparse
+import math
+import os
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+
+import lfb_aggregations as agg
+import lfb_backend
+import lfb_bitmap as bitmap
+import lfb_data as data
+import lfb_diskcache as diskcache
+import lfb_sections as sections
+import lfb_timeindex as timeindex
+
+#######################################################################################
+#######################################################################################
+
+# Relative tolerance of floating point comparisons (different summation order
+# between engines); counts, labels and row sets are compared exactly
+RTOL = 1e-9
+
+#######################################################################################
+#######################################################################################
+
+# Reference implementation: the dashboard computations before any optimization
+
+
+def reference_kpis(filtered_df):
+    return {
+        "total_incidents": len(filtered_df),
+        "median_response": filtered_df["FirstPumpArriving_AttendanceTime"].median() / 60,
+        "response_within_6min": (filtered_df["FirstPumpArriving_AttendanceTime"] <= 360).mean() * 100,
+        "false_alarm_rate": (filtered_df["IncidentGroup"] == "False Alarm").mean() * 100,
+        "fire_rate": (filtered_df["IncidentGroup"] == "Fire").mean() * 100,
+        "special_service_rate": (filtered_df["IncidentGroup"] == "Special Service").mean() * 100,
+        "p90_response": filtered_df["FirstPumpArriving_AttendanceTime"].quantile(0.90) / 60,
+        "avg_response": filtered_df["FirstPumpArriving_AttendanceTime"].mean() / 60,
+        "second_pump_rate": filtered_df["SecondPumpArriving_AttendanceTime"].notna().mean() * 100,
+        "avg_pumps": filtered_df["NumPumpsAttending"].mean(),
+    }
+
+
+def reference_monthly_incidents_by_type(filtered_df):
+    return (
+        filtered_df
+        .groupby(["CallMonth", "IncidentGroup"])["IncidentNumber"]
+        .nunique()
+        .reset_index(name="IncidentCount")
+    )
+
+
+def reference_daily_hourly_incidents(filtered_df):
+    daily_hourly_incidents = filtered_df.pivot_table(
+        index="HourOfCall",
+        columns="CallWeekday",
+        values="IncidentNumber",
+        aggfunc="nunique"
+    )
+
+    return (
+        daily_hourly_incidents
+        .reindex(index=range(24))
+        .reindex(columns=agg.WEEKDAY_ORDER)
+    )
+
+
+def reference_median_response_by_borough(filtered_df):
+    return (
+        filtered_df
+        .groupby("IncGeo_BoroughName")["FirstPumpArriving_AttendanceTime"]
+        .median()
+        .div(60)
+        .reset_index(name="MedianResponseMinutes")
+        .sort_values("MedianResponseMinutes")
+    )
+
+
+def reference_compliance_by_borough(filtered_df):
+    return (
+        filtered_df
+        .groupby("IncGeo_BoroughName")["FirstPump_Within_6min"]
+        .mean()
+        .mul(100)
+        .reset_index(name="CompliancePercent")
+        .sort_values("CompliancePercent")
+    )
+
+
+def reference_band_pivot(filtered_df):
+    filtered_df = filtered_df.copy()
+    filtered_df["ResponseMinutes"] = filtered_df["FirstPumpArriving_AttendanceTime"] / 60
+
+    filtered_df["ResponseBand"] = pd.cut(
+        filtered_df["ResponseMinutes"],
+        bins=agg.RESPONSE_BANDS,
+        labels=agg.RESPONSE_BAND_LABELS,
+        right=True
+    )
+
+    band_counts = (
+        filtered_df
+        .groupby(["IncidentGroup", "ResponseBand"], observed=False)
+        .size()
+        .reset_index(name="Count")
+    )
+
+    band_counts["Percent"] = (
+        band_counts.groupby("IncidentGroup")["Count"]
+        .transform(lambda x: 100 * x / x.sum())
+    )
+
+    band_pivot = band_counts.pivot(
+        index="IncidentGroup",
+        columns="ResponseBand",
+        values="Percent"
+    ).fillna(0)
+
+    return band_pivot[agg.RESPONSE_BAND_LABELS]
+
+
+def reference_decomposition(filtered_df):
+    decomposition = (
+        filtered_df
+        .groupby("IncidentGroup")[["TurnoutTimeSeconds", "TravelTimeSeconds"]]
+        .mean()
+        .div(60)
+        .reset_index()
+    )
+
+    decomposition["TotalMinutes"] = (
+        decomposition["TurnoutTimeSeconds"] +
+        decomposition["TravelTimeSeconds"]
+    )
+
+    decomposition["TurnoutPercent"] = (
+        decomposition["TurnoutTimeSeconds"] /
+        decomposition["TotalMinutes"] * 100
+    )
+
+    decomposition["TravelPercent"] = (
+        decomposition["TravelTimeSeconds"] /
+        decomposition["TotalMinutes"] * 100
+    )
+
+    order = [group for group in agg.DECOMPOSITION_ORDER if group in set(decomposition["IncidentGroup"])]
+    return decomposition.set_index("IncidentGroup").loc[order].reset_index()
+
+
+def reference_delay_counts_extreme(filtered_df):
+    extreme_df = filtered_df[filtered_df["FirstPumpArriving_AttendanceTime"] / 60 > 10]
+
+    delay_counts_extreme = (
+        extreme_df
+        .groupby("DelayCode_Description")
+        .size()
+        .reset_index(name="IncidentCount")
+        .sort_values("IncidentCount", ascending=False)
+    )
+
+    total_extreme = delay_counts_extreme["IncidentCount"].sum()
+
+    delay_counts_extreme["Percent"] = (
+        delay_counts_extreme["IncidentCount"] / total_extreme * 100
+    )
+    delay_counts_extreme["CumulativePercent"] = delay_counts_extreme["Percent"].cumsum()
+
+    return delay_counts_extreme
+
+
+def reference_percentile_decomposition(filtered_df, by):
+    # Later sections, same pandas-only style: groupby quantiles per component
+    frames = []
+    for component, column in agg.DECOMPOSITION_COMPONENTS.items():
+        frame = (
+            filtered_df
+            .groupby(by)[column]
+            .quantile(agg.DECOMPOSITION_PERCENTILES)
+            .div(60)
+            .unstack()
+        )
+        frame.columns = [f"P{round(q * 100)}" for q in agg.DECOMPOSITION_PERCENTILES]
+        frames.append(frame.reset_index().assign(Component=component))
+    return pd.concat(frames, ignore_index=True)
+
+
+def reference_borough_group_volume(filtered_df):
+    keys = ["IncGeo_BoroughName", "IncidentGroup"]
+    return (
+        filtered_df
+        .groupby(keys)
+        .agg(
+            Incidents=("IncidentNumber", "nunique"),
+            MedianResponse=("FirstPumpArriving_AttendanceTime", "median"),
+        )
+        .reset_index()
+        .assign(MedianResponse=lambda frame: frame["MedianResponse"] / 60)
+    )
+
+
+# name -> (reference, optimized(df, backend), columns identifying a row,
+#          sorted columns that must also agree row by row)
+COMPUTATIONS = {
+    "monthly_incidents_by_type": (
+        reference_monthly_incidents_by_type, agg.monthly_incidents_by_type,
+        ["CallMonth", "IncidentGroup"], []
+    ),
+    "daily_hourly_incidents": (reference_daily_hourly_incidents, agg.daily_hourly_incidents, None, []),
+    "median_response_by_borough": (
+        reference_median_response_by_borough, agg.median_response_by_borough,
+        ["IncGeo_BoroughName"], ["MedianResponseMinutes"]
+    ),
+    "compliance_by_borough": (
+        reference_compliance_by_borough, agg.compliance_by_borough,
+        ["IncGeo_BoroughName"], ["CompliancePercent"]
+    ),
+    "band_pivot": (reference_band_pivot, agg.band_pivot, None, []),
+    "decomposition": (reference_decomposition, agg.decomposition, None, []),
+    "delay_counts_extreme": (
+        reference_delay_counts_extreme, agg.delay_counts_extreme,
+        ["DelayCode_Description"], ["IncidentCount", "Percent", "CumulativePercent"]
+    ),
+}
+
+#######################################################################################
+#######################################################################################
+
+
+def synthetic_data(n=20000, seed=7):
+    # Raw incident rows with the awkward cases of the real data: repeated
+    # incident numbers, missing boroughs, delay codes and attendance times,
+    # ties, attendance beyond the histogram cap (for a whole borough's fires
+    # too) and an incident group that is absent in some months
+    rng = np.random.default_rng(seed)
+
+    dates = pd.Timestamp("2022-01-01") + pd.to_timedelta(rng.integers(0, 730, n), unit="D")
+    groups = rng.choice(agg.INCIDENT_GROUPS, n, p=[0.5, 0.2, 0.3])
+    groups[(dates.month == 2) & (groups == "Fire")] = "Special Service"
+
+    attendance = rng.gamma(6, 55, n).round()
+    attendance[rng.random(n) < 0.03] = np.nan
+    attendance[rng.random(n) < 0.002] = 2400
+
+    boroughs = rng.choice([f"Borough {i}" for i in range(12)] + [None], n)
+    attendance[(boroughs == "Borough 11") & (groups == "Fire")] += timeindex.HIST_MAX_SECONDS
+    delays = rng.choice(["Not held up", "Traffic", "Weather", "Address incomplete/wrong", None], n)
+
+    return pd.DataFrame({
+        "IncidentNumber": [f"{number:05d}" for number in rng.integers(0, n // 2, n)],
+        "CallDate": dates.strftime("%Y-%m-%d"),
+        "TimeOfCall": pd.to_timedelta(rng.integers(0, 86400, n), unit="s").map(
+            lambda delta: f"{delta.components.hours:02d}:{delta.components.minutes:02d}:00"
+        ),
+        "IncidentGroup": groups,
+        "IncGeo_BoroughName": boroughs,
+        "FirstPumpArriving_AttendanceTime": attendance,
+        "SecondPumpArriving_AttendanceTime": np.where(rng.random(n) < 0.4, attendance + 60, np.nan),
+        "NumPumpsAttending": rng.integers(1, 5, n).astype(float),
+        "TurnoutTimeSeconds": rng.gamma(4, 20, n).round(),
+        "TravelTimeSeconds": rng.gamma(5, 50, n).round(),
+        "DelayCode_Description": delays,
+    })
+
+
+def filter_states(df):
+    # (name, date window or None, bitmap selections) covering full, year,
+    # month and arbitrary date windows plus dimension filters
+    first, last = df["CallDate"].iloc[0], df["CallDate"].iloc[-1]
+    year = int(df["Year"].iloc[len(df) // 2])
+    month = int(df["Month"].iloc[len(df) // 2])
+    boroughs = sorted(df["IncGeo_BoroughName"].dropna().unique())[:3]
+
+    return [
+        ("all", (first, last), {}),
+        (f"year {year}", timeindex.year_window(year), {}),
+        (f"month {year}-{month:02d}", timeindex.month_window(year, month), {}),
+        ("window", (first + pd.Timedelta(days=45), first + pd.Timedelta(days=200)), {}),
+        ("fire, 3 boroughs", timeindex.year_window(year), {
+            "IncidentGroup": ["Fire"], "IncGeo_BoroughName": boroughs,
+        }),
+        ("evening, delayed", (first, last), {
+            "HourOfCall": list(range(17, 23)), "DelayCode_Description": ["Traffic", "Weather"],
+        }),
+    ]
+
+
+def reference_filter(df, window, selections):
+    # Boolean masks over the whole frame, as the dashboard filtered originally
+    start, end = window
+    calls = df["CallDate"].dt.normalize()
+    mask = (calls >= pd.Timestamp(start).normalize()) & (calls <= pd.Timestamp(end).normalize())
+    for column, values in selections.items():
+        mask &= df[column].isin(values)
+    return df[mask]
+
+#######################################################################################
+#######################################################################################
+
+
+def _close(expected, actual):
+    if pd.isna(expected) or pd.isna(actual):
+        return pd.isna(expected) and pd.isna(actual)
+    return math.isclose(expected, actual, rel_tol=RTOL, abs_tol=1e-12)
+
+
+def compare_kpis(expected, actual):
+    wrong = [
+        f"{kpi}: {expected[kpi]!r} != {actual[kpi]!r}"
+        for kpi in expected if not _close(expected[kpi], actual[kpi])
+    ]
+    return "; ".join(wrong) or None
+
+
+def compare_frames(expected, actual, keys=None, ordered=()):
+    # Rows identified by keys are compared independently of their order (ties
+    # in sorted outputs may come out in any order); the ordered columns must
+    # still agree position by position
+    try:
+        if ordered:
+            pd.testing.assert_frame_equal(
+                expected[ordered].reset_index(drop=True), actual[ordered].reset_index(drop=True),
+                check_dtype=False, rtol=RTOL
+            )
+
+        if keys:
+            expected = expected.sort_values(keys, ignore_index=True)
+            actual = actual.sort_values(keys, ignore_index=True)
+
+        pd.testing.assert_frame_equal(
+            expected.reset_index(drop=keys is not None),
+            actual.reset_index(drop=keys is not None),
+            check_dtype=False, check_index_type=False, check_column_type=False,
+            check_categorical=False, check_names=False, rtol=RTOL
+        )
+    except AssertionError as error:
+        return " ".join(str(error).split())
+    return None
+
+
+def best_time(function, *args, repeat=3):
+    best, result = float("inf"), None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function(*args)
+        best = min(best, time.perf_counter() - started)
+    return result, best
+
+
+class Results:
+    """Collected check outcomes and timings."""
+
+    def __init__(self, repeat):
+        self.repeat = repeat
+        self.rows = []
+
+    def check(self, dataset, state, name, path, reference, optimized, compare):
+        expected, reference_seconds = reference
+        actual, optimized_seconds = optimized
+        self.rows.append({
+            "dataset": dataset,
+            "state": state,
+            "check": name,
+            "path": path,
+            "problem": compare(expected, actual),
+            "reference_ms": reference_seconds * 1000,
+            "optimized_ms": optimized_seconds * 1000,
+        })
+
+    def frame(self):
+        return pd.DataFrame(self.rows)
+
+#######################################################################################
+#######################################################################################
+
+
+def verify_dataset(results, dataset, df):
+    repeat = results.repeat
+    backends = {name: lfb_backend.get_backend(name) for name in lfb_backend.available_backends()}
+    daily = timeindex.build_daily_aggregates(df)
+    volume_daily = agg.build_borough_group_daily(df)
+    bitmap_index = bitmap.build_bitmap_index(df, data.BITMAP_COLUMNS)
+
+    for state, window, selections in filter_states(df):
+        reference_rows, reference_seconds = best_time(reference_filter, df, window, selections, repeat=repeat)
+
+        # Optimized filter path of the dashboard: binary search on the sorted
+        # dates, then bitmap intersection within the window
+        def optimized_filter():
+            lo, hi = timeindex.date_bounds(df, *window)
+            if selections:
+                return df.take(bitmap.select_rows(bitmap_index, selections, lo, hi))
+            return df.iloc[lo:hi]
+
+        filtered, filter_seconds = best_time(optimized_filter, repeat=repeat)
+        results.check(
+            dataset, state, "filtered rows", "date bounds + bitmaps",
+            (reference_rows, reference_seconds), (filtered, filter_seconds),
+            lambda expected, actual: None if expected.index.equals(actual.index) else
+            f"{len(expected):,} rows expected, {len(actual):,} selected"
+        )
+
+        kpis = best_time(reference_kpis, reference_rows, repeat=repeat)
+        for name, backend in backends.items():
+            results.check(
+                dataset, state, "kpis", f"backend {name}",
+                kpis, best_time(agg.compute_kpis, filtered, backend, repeat=repeat), compare_kpis
+            )
+
+        if not selections:
+            results.check(
+                dataset, state, "kpis", "daily pre-aggregates",
+                kpis, best_time(timeindex.range_kpis, daily, *window, repeat=repeat), compare_kpis
+            )
+
+        for name, (reference, optimized, keys, ordered) in COMPUTATIONS.items():
+            expected = best_time(reference, reference_rows, repeat=repeat)
+            for backend_name, backend in backends.items():
+                results.check(
+                    dataset, state, name, f"backend {backend_name}",
+                    expected, best_time(optimized, filtered, backend, repeat=repeat),
+                    lambda expected, actual, keys=keys, ordered=ordered: compare_frames(expected, actual, keys, ordered)
+                )
+
+        for by in ["IncidentGroup", "IncGeo_BoroughName"]:
+            results.check(
+                dataset, state, f"percentile_decomposition by {by}", "segment quantiles",
+                best_time(reference_percentile_decomposition, reference_rows, by, repeat=repeat),
+                best_time(agg.percentile_decomposition, filtered, by, repeat=repeat),
+                lambda expected, actual, by=by: compare_frames(expected, actual[expected.columns], [by, "Component"])
+            )
+
+        results.check(
+            dataset, state, "borough_group_volume", "bincount + histogram sketch",
+            best_time(reference_borough_group_volume, reference_rows, repeat=repeat),
+            best_time(agg.borough_group_volume, filtered, repeat=repeat),
+            lambda expected, actual: compare_frames(
+                expected[expected["Incidents"] > 0], actual, ["IncGeo_BoroughName", "IncidentGroup"]
+            )
+        )
+
+        if not selections:
+            results.check(
+                dataset, state, "borough_group_volume", "daily pre-aggregates",
+                best_time(reference_borough_group_volume, reference_rows, repeat=repeat),
+                best_time(agg.borough_group_volume_range, volume_daily, *window, repeat=repeat),
+                lambda expected, actual: compare_frames(
+                    expected[expected["Incidents"] > 0], actual, ["IncGeo_BoroughName", "IncidentGroup"]
+                )
+            )
+
+        verify_disk_cache(results, dataset, state, filtered)
+
+
+def verify_disk_cache(results, dataset, state, filtered):
+    # Every section result must come back from the on-disk cache unchanged
+    with tempfile.TemporaryDirectory() as directory:
+        cache = diskcache.DiskCache(directory)
+
+        for name in sections.SECTIONS:
+            computed, compute_seconds = best_time(sections.compute_section, name, filtered, repeat=1)
+            cache.put(name, computed)
+            cached, read_seconds = best_time(cache.get, name, repeat=results.repeat)
+
+            results.check(
+                dataset, state, f"section {name}", "disk cache",
+                (computed, compute_seconds), (cached, read_seconds), compare_cached
+            )
+
+
+def compare_cached(expected, actual):
+    if actual is None:
+        return "not cached"
+
+    if isinstance(expected, dict):
+        if list(expected) != list(actual):
+            return f"keys {list(expected)} != {list(actual)}"
+        problems = [
+            f"{key}: {problem}" for key in expected
+            if (problem := compare_cached(expected[key], actual[key]))
+        ]
+        return "; ".join(problems) or None
+
+    if isinstance(expected, pd.DataFrame):
+        try:
+            pd.testing.assert_frame_equal(expected, actual)
+        except AssertionError as error:
+            return " ".join(str(error).split())
+        return None
+
+    if isinstance(expected, pd.Series):
+        try:
+            pd.testing.assert_series_equal(expected, actual)
+        except AssertionError as error:
+            return " ".join(str(error).split())
+        return None
+
+    return None if _close(expected, actual) else f"{expected!r} != {actual!r}"
+
+#######################################################################################
+#######################################################################################
+
+
+def report(results):
+    table = results.frame()
+
+    summary = (
+        table
+        .groupby(["check", "path"], sort=False)
+        .agg(
+            checks=("problem", "size"),
+            failed=("problem", lambda problems: problems.notna().sum()),
+            reference_ms=("reference_ms", "sum"),
+            optimized_ms=("optimized_ms", "sum"),
+        )
+        .reset_index()
+    )
+    summary["speedup"] = summary["reference_ms"] / summary["optimized_ms"]
+
+    with pd.option_context("display.width", 160, "display.max_rows", None):
+        print(summary.to_string(
+            index=False,
+            formatters={
+                "reference_ms": "{:.1f}".format,
+                "optimized_ms": "{:.1f}".format,
+                "speedup": "{:.1f}x".format,
+            }
+        ))
+
+    failures = table[table["problem"].notna()]
+    for row in failures.itertuples():
+        print(f"MISMATCH [{row.dataset} | {row.state}] {row.check} via {row.path}: {row.problem[:500]}")
+
+    return failures
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", default=data.DATA_PATH, help="incident parquet file (skipped if absent)")
+    parser.add_argument("--synthetic-rows", type=int, default=20000)
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args(argv)
+
+    datasets = {"synthetic": data.prepare_data(synthetic_data(args.synthetic_rows))}
+    if os.path.exists(args.data):
+        datasets[os.path.basename(args.data)] = data.load_prepared_data(args.data)
+
+    results = Results(args.repeat)
+    for dataset, df in datasets.items():
+        print(f"Verifying {dataset} ({len(df):,} rows)…")
+        verify_dataset(results, dataset, df)
+
+    failures = report(results)
+    total = len(results.rows)
+
+    if len(failures):
+        print(f"FAIL: {len(failures)} of {total} checks differ from the reference")
+        return 1
+
+    print(f"OK: {total} checks match the reference")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())